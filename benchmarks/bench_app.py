@@ -0,0 +1,203 @@
+"""End-to-end rerun benchmark against an in-memory fake worksheet.
+
+The app is run headlessly with Streamlit's ``AppTest``. ``open_storage`` is
+swapped for a ``MemoryStorage`` seeded with N synthetic Karachi stations, so
+no Google credentials or network are needed. For each size it reports, per
+flow (map view, nearest search, add charger):
+
+* cold and warm rerun latency (median and worst of ``--repeat`` warm reruns),
+* peak Python memory of one rerun (``tracemalloc``),
+* payload size: every element sent to the browser, and the map components
+  alone.
+
+Run from the repository root:
+
+    python benchmarks/bench_app.py
+    python benchmarks/bench_app.py --sizes 1000 10000 --repeat 5 --stages
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import perf  # noqa: E402
+import storage  # noqa: E402
+from station_frame import AMENITIES  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, 'ev_app.py')
+FAKE_STORAGE_URL = 'fake://bench'
+KARACHI_LAT = 24.8607
+KARACHI_LON = 67.0011
+
+
+def synthetic_stations(n, seed=0):
+    """``n`` station records scattered over Karachi, shaped like ``get_all_records`` output."""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(24.80, 25.05, n)
+    lons = rng.uniform(66.95, 67.25, n)
+    types = rng.choice(["2kWh", "7kWh", "50kWh"], n)
+    statuses = rng.choice(["Available", "In Use", "Out of Service"], n, p=[0.7, 0.2, 0.1])
+    prices = rng.uniform(20, 90, n).round(2)
+    ratings = rng.integers(0, 6, n)
+    hours = rng.choice(["24/7", "9 AM - 10 PM", "8:00 - 20:00", ""], n)
+    records = []
+    for i in range(n):
+        amenities = [name for name in AMENITIES if rng.random() < 0.3]
+        records.append({
+            'name': f"Bench Station {i}", 'lat': float(lats[i]), 'lon': float(lons[i]),
+            'price': float(prices[i]), 'type': str(types[i]), 'contact': '0300-0000000',
+            'status': str(statuses[i]), 'rating': int(ratings[i]), 'reviews': int(ratings[i] > 0),
+            'amenities': json.dumps(amenities), 'operating_hours': str(hours[i]),
+            'verified_email': 'bench',
+        })
+    return records
+
+
+_real_open_storage = storage.open_storage
+
+
+def use_fake_storage(fake):
+    """Route the app's ``open_storage`` call to ``fake`` and drop cached resources."""
+    def open_storage(url, service_account_info=None):
+        if url == FAKE_STORAGE_URL:
+            return fake
+        return _real_open_storage(url, service_account_info)
+
+    storage.open_storage = open_storage
+    os.environ['EV_STORAGE'] = FAKE_STORAGE_URL
+    st.cache_resource.clear()
+
+
+def payload_bytes(at):
+    """``(all elements, map components)`` serialized sizes of the last rerun."""
+    total = components = 0
+    stack = [at._tree]
+    while stack:
+        node = stack.pop()
+        children = getattr(node, 'children', None)
+        if children:
+            stack.extend(children.values() if isinstance(children, dict) else children)
+            continue
+        proto = getattr(node, 'proto', None)
+        if proto is not None and hasattr(proto, 'ByteSize'):
+            size = proto.ByteSize()
+            total += size
+            if getattr(node, 'type', None) == 'component_instance':
+                components += size
+    return total, components
+
+
+def timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed
+
+
+def peak_memory_mb(action):
+    tracemalloc.start()
+    try:
+        action()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def new_app(timeout):
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    return at, timed_run(at)
+
+
+def open_page(at, label):
+    """Select a page in the app's navigation radio (the script only runs that page)."""
+    nav = at.radio(key='nav')
+    page = next(option for option in nav.options if label in option)
+    if nav.value != page:
+        nav.set_value(page)
+
+
+def map_flow(at, step):
+    """Plain rerun of the map page."""
+
+
+def nearest_flow(at, step):
+    """Search from a point that moves a little each rerun, so results are recomputed."""
+    if step == 1:
+        open_page(at, "Find Nearest")
+        at.run()
+    at.number_input(key='user_lat_input').set_value(KARACHI_LAT + 0.001 * step)
+    at.number_input(key='user_lon_input').set_value(KARACHI_LON)
+
+
+def add_flow(at, step):
+    """Submit the add-charger form with a new station."""
+    if step == 1:
+        open_page(at, "Add Charger")
+        at.run()
+    next(t for t in at.text_input if t.label == "Station Name").set_value(f"Bench New {step}")
+    at.number_input(key='lat_input').set_value(KARACHI_LAT + 0.0005 * step)
+    at.number_input(key='lon_input').set_value(KARACHI_LON + 0.0005 * step)
+    next(b for b in at.button if "Add Charging" in str(b.label)).click()
+
+
+FLOWS = {'map': map_flow, 'nearest': nearest_flow, 'add': add_flow}
+
+
+def bench_flow(flow, records, repeat, timeout):
+    fake = storage.MemoryStorage(records)
+    use_fake_storage(fake)
+    perf.reset()
+    at, cold = new_app(timeout)
+    warm = []
+    for step in range(1, repeat + 1):
+        FLOWS[flow](at, step)
+        warm.append(timed_run(at))
+    stages = perf.totals()['spans']  # before the (slower) traced rerun
+    FLOWS[flow](at, repeat + 1)
+    peak = peak_memory_mb(lambda: timed_run(at))
+    total, components = payload_bytes(at)
+    return {
+        'cold_ms': cold, 'warm_ms': statistics.median(warm), 'max_ms': max(warm),
+        'peak_mb': peak, 'payload_kb': total / 1024, 'map_kb': components / 1024,
+        'sheet_calls': fake.stations().calls, 'stages': stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--flows', nargs='+', choices=list(FLOWS), default=list(FLOWS))
+    parser.add_argument('--repeat', type=int, default=3, help="warm reruns per flow")
+    parser.add_argument('--timeout', type=float, default=300, help="seconds allowed per rerun")
+    parser.add_argument('--stages', action='store_true', help="also print mean ms per perf span")
+    args = parser.parse_args(argv)
+
+    print(f"{'stations':>9} {'flow':>8} {'cold':>9} {'warm':>9} {'worst':>9} {'peak MB':>8} "
+          f"{'payload KB':>11} {'map KB':>8} {'sheet calls':>12}")
+    for n in args.sizes:
+        records = synthetic_stations(n)
+        for flow in args.flows:
+            result = bench_flow(flow, records, args.repeat, args.timeout)
+            print(f"{n:>9} {flow:>8} {result['cold_ms']:>7.0f}ms {result['warm_ms']:>7.0f}ms "
+                  f"{result['max_ms']:>7.0f}ms {result['peak_mb']:>8.1f} {result['payload_kb']:>11.1f} "
+                  f"{result['map_kb']:>8.1f} {result['sheet_calls']:>12}")
+            if args.stages:
+                stages = ', '.join(f"{name} {stats['mean_ms']:.1f}" for name, stats in sorted(result['stages'].items()))
+                print(f"{'':>19} mean ms: {stages}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare the vectorized distance engine with the old per-row geodesic apply.
+
+Run from the repository root:
+
+    python benchmarks/bench_distance.py
+    python benchmarks/bench_distance.py --sizes 1000 10000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_utils import distances_from  # noqa: E402
+
+KARACHI_LAT = 24.8607
+KARACHI_LON = 67.0011
+
+
+def synthetic_stations(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'lat': rng.uniform(24.7, 25.1, n),
+        'lon': rng.uniform(66.8, 67.4, n),
+    })
+
+
+def geodesic_apply(df):
+    return df.apply(
+        lambda row: geodesic((KARACHI_LAT, KARACHI_LON), (row['lat'], row['lon'])).kilometers,
+        axis=1
+    )
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top-k', type=int, default=50, help="geodesic refinement candidates")
+    args = parser.parse_args(argv)
+
+    print(f"{'stations':>10} {'geodesic apply':>16} {'haversine':>12} {'+top-k refine':>15} {'speedup':>9} {'max err km':>11}")
+    for n in args.sizes:
+        df = synthetic_stations(n)
+        # The apply path is very slow at 100k; time it once there.
+        apply_repeat = 1 if n >= 100000 else args.repeat
+        t_apply = best_of(lambda: geodesic_apply(df), apply_repeat)
+        t_vec = best_of(lambda: distances_from(df, KARACHI_LAT, KARACHI_LON), args.repeat)
+        t_ref = best_of(lambda: distances_from(df, KARACHI_LAT, KARACHI_LON, refine_top_k=args.top_k), args.repeat)
+        err = np.max(np.abs(geodesic_apply(df.head(1000)).to_numpy()
+                            - distances_from(df.head(1000), KARACHI_LAT, KARACHI_LON)))
+        print(f"{n:>10} {t_apply * 1000:>14.1f}ms {t_vec * 1000:>10.2f}ms {t_ref * 1000:>13.2f}ms "
+              f"{t_apply / t_ref:>8.0f}x {err:>11.4f}")
+
+
+if __name__ == '__main__':
+    main()
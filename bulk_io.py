@@ -0,0 +1,268 @@
+"""Bulk station import and export.
+
+Imports stream CSV (``pandas.read_csv`` in chunks) or a GeoJSON
+FeatureCollection (features decoded one at a time), validate each station
+with the same checks as the add form, skip stations that duplicate an
+existing or already-imported one (nearby and with a similar name), and write
+in batched ``append_rows`` calls. Exports stream the stored records back out
+as CSV or GeoJSON.
+
+From the command line:
+
+    python bulk_io.py import operators.csv --storage sqlite:///stations.db
+    python bulk_io.py export stations.geojson
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from dedup import DuplicateChecker
+from station_frame import AMENITIES, AMENITY_COLUMNS, new_station_id, to_number
+from station_store import STATION_COLUMNS
+from storage import add_storage_arguments, storage_from_args
+from validation import has_required_fields, is_on_land
+from write_queue import WriteQueue
+
+CHUNK_SIZE = 500
+DEFAULT_STATUS = "Available"
+_READ_SIZE = 64 * 1024
+
+
+def iter_csv_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Lists of up to ``chunk_size`` record dicts from a CSV file."""
+    for chunk in pd.read_csv(fileobj, chunksize=chunk_size, dtype=str, keep_default_na=False):
+        yield chunk.to_dict('records')
+
+
+def _iter_features(fileobj):
+    """Decode the ``features`` array of a FeatureCollection one feature at a time."""
+    decoder = json.JSONDecoder()
+    # Incremental, so a multibyte character split across two reads decodes intact.
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    in_array = False
+
+    def refill():
+        nonlocal buffer, position
+        raw = fileobj.read(_READ_SIZE)
+        data = utf8.decode(raw, final=not raw) if isinstance(raw, bytes) else raw
+        buffer = buffer[position:] + data
+        position = 0
+        return bool(raw)
+
+    while True:
+        if not in_array:
+            start = buffer.find('"features"', position)
+            bracket = buffer.find('[', start) if start != -1 else -1
+            if bracket == -1:
+                if not refill():
+                    raise ValueError("No 'features' array found in GeoJSON")
+                continue
+            position = bracket + 1
+            in_array = True
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer):
+            if not refill():
+                return
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            feature, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if not refill():
+                raise
+            continue
+        position = end
+        yield feature
+
+
+def _feature_record(feature):
+    record = dict(feature.get('properties') or {})
+    geometry = feature.get('geometry') or {}
+    if geometry.get('type') == 'Point':
+        record['lon'], record['lat'] = geometry['coordinates'][:2]
+    return record
+
+
+def iter_geojson_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Lists of up to ``chunk_size`` record dicts from a GeoJSON FeatureCollection of Points."""
+    chunk = []
+    for feature in _iter_features(fileobj):
+        chunk.append(_feature_record(feature))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_chunks(name, fileobj, chunk_size=CHUNK_SIZE):
+    """Pick the CSV or GeoJSON reader from the file name."""
+    if name.lower().endswith(('.geojson', '.json')):
+        return iter_geojson_chunks(fileobj, chunk_size)
+    return iter_csv_chunks(fileobj, chunk_size)
+
+
+def _amenities(value):
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        text = str(value or '').strip()
+        try:
+            items = json.loads(text) if text.startswith('[') else [part.strip() for part in text.split(';')]
+        except ValueError:
+            items = []
+    return json.dumps([item for item in AMENITIES if item in items])
+
+
+def station_row(record):
+    """Values in ``STATION_COLUMNS`` order for an imported record."""
+    return [
+        str(record.get('name', '')).strip(),
+        to_number(record.get('lat')),
+        to_number(record.get('lon')),
+        to_number(record.get('price')),
+        str(record.get('type', '')).strip(),
+        str(record.get('contact', '')).strip(),
+        str(record.get('status') or DEFAULT_STATUS).strip(),
+        0,
+        0,
+        _amenities(record.get('amenities')),
+        str(record.get('operating_hours', '')).strip(),
+        str(record.get('verified_email') or 'bulk_import').strip(),
+        str(record.get('station_id') or '').strip() or new_station_id(),
+    ]
+
+
+def import_stations(chunks, sheet, existing=None, batch_size=CHUNK_SIZE, dry_run=False, sleep=None):
+    """Validate, deduplicate and write record chunks; returns a summary dict.
+
+    ``existing`` is the current station frame to deduplicate against. Writes
+    go through a synchronous ``WriteQueue`` so quota errors are retried;
+    ``errors`` counts the stations that still couldn't be written.
+    """
+    checker = DuplicateChecker(existing)
+    queue_options = {'sleep': sleep} if sleep is not None else {}
+    queue = WriteQueue(sheet, batch_size=batch_size, start=False, **queue_options)
+    summary = {'read': 0, 'imported': 0, 'duplicates': 0, 'invalid': [], 'errors': 0}
+    for chunk in chunks:
+        for record in chunk:
+            summary['read'] += 1
+            row = station_row(record)
+            name, lat, lon, charger_type = row[0], row[1], row[2], row[4]
+            if not has_required_fields(name, lat, lon, charger_type):
+                summary['invalid'].append((summary['read'], name, "missing name, coordinates or type"))
+            elif not is_on_land(lat, lon):
+                summary['invalid'].append((summary['read'], name, "outside the service area"))
+            elif checker.find(name, lat, lon) is not None:
+                summary['duplicates'] += 1
+            else:
+                checker.add(name, lat, lon)
+                summary['imported'] += 1
+                if not dry_run:
+                    queue.enqueue_row(row)
+        if not dry_run:
+            queue.flush()
+    summary['errors'] = queue.failed + queue.pending()
+    return summary
+
+
+def iter_record_chunks(records, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(records), chunk_size):
+        yield records[start:start + chunk_size]
+
+
+def frame_records(df):
+    """Sheet-style records from the typed station frame (amenity columns back to a JSON list)."""
+    out = pd.DataFrame({column: df[column] for column in STATION_COLUMNS if column in df})
+    for column in ('lat', 'lon'):
+        out[column] = df[column].astype(np.float64).round(6)
+    out['price'] = df['price'].astype(np.float64).round(2)
+    for column in ('type', 'status'):
+        out[column] = df[column].astype(str)
+    flags = df[AMENITY_COLUMNS].to_numpy(dtype=bool)
+    out['amenities'] = [json.dumps([name for name, has in zip(AMENITIES, row) if has]) for row in flags]
+    return out[STATION_COLUMNS].to_dict('records')
+
+
+def export_csv(records, fileobj, chunk_size=CHUNK_SIZE):
+    """Write station records as CSV, one chunk at a time."""
+    writer = csv.writer(fileobj)
+    writer.writerow(STATION_COLUMNS)
+    for chunk in iter_record_chunks(records, chunk_size):
+        writer.writerows([[record.get(c, '') for c in STATION_COLUMNS] for record in chunk])
+
+
+def export_geojson(records, fileobj, chunk_size=CHUNK_SIZE):
+    """Write station records as a GeoJSON FeatureCollection of Points, one chunk at a time."""
+    fileobj.write('{"type": "FeatureCollection", "features": [\n')
+    first = True
+    for chunk in iter_record_chunks(records, chunk_size):
+        lines = []
+        for record in chunk:
+            lat, lon = to_number(record.get('lat'), None), to_number(record.get('lon'), None)
+            if lat is None or lon is None:
+                continue
+            properties = {c: record.get(c, '') for c in STATION_COLUMNS if c not in ('lat', 'lon')}
+            feature = {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                       'properties': properties}
+            lines.append(('' if first else ',\n') + json.dumps(feature))
+            first = False
+        fileobj.write(''.join(lines))
+    fileobj.write('\n]}\n')
+
+
+def export_records(name, records, fileobj):
+    if name.lower().endswith(('.geojson', '.json')):
+        export_geojson(records, fileobj)
+    else:
+        export_csv(records, fileobj)
+
+
+def export_bytes(name, records):
+    """Exported file contents, for ``st.download_button``."""
+    buffer = io.StringIO()
+    export_records(name, records, buffer)
+    return buffer.getvalue().encode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import or export charging stations.")
+    add_storage_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="import stations from a CSV or GeoJSON file")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--dry-run', action='store_true', help="validate and deduplicate only")
+    import_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    export_parser = subparsers.add_parser('export', help="export stations to a CSV or GeoJSON file")
+    export_parser.add_argument('path')
+    args = parser.parse_args(argv)
+
+    sheet = storage_from_args(args).stations()
+    records = sheet.get_all_records()
+    if args.command == 'import':
+        with open(args.path, 'rb') as f:
+            summary = import_stations(iter_chunks(args.path, f, args.chunk_size), sheet,
+                                      existing=pd.DataFrame(records), batch_size=args.chunk_size,
+                                      dry_run=args.dry_run)
+        print(f"Read {summary['read']}, imported {summary['imported']}, "
+              f"skipped {summary['duplicates']} duplicates and {len(summary['invalid'])} invalid rows, "
+              f"{summary['errors']} stations not saved.")
+        for line, name, reason in summary['invalid'][:20]:
+            print(f"  row {line} ({name or 'unnamed'}): {reason}")
+    else:
+        with open(args.path, 'w', newline='', encoding='utf-8') as f:
+            export_records(args.path, records, f)
+        print(f"Exported {len(records)} stations to {args.path}.")
+
+
+if __name__ == '__main__':
+    main()
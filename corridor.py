@@ -0,0 +1,163 @@
+"""Route corridor search: chargers within a buffer of a polyline.
+
+A route is a list of ``(lat, lon)`` points, either two geocoded places joined
+by a straight segment or a track read from a GPX/GeoJSON upload. Dense tracks
+are first simplified to within a small fraction of the buffer. Candidates
+come from the spatial index (one bounding-box lookup per segment), and each
+candidate is measured only against the segments whose padded box it fell in,
+in vectorized blocks on a local equirectangular projection. Matches are
+ordered by how far along the route they are.
+"""
+import json
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from geo_utils import haversine_km
+
+KM_PER_DEG_LAT = 111.32
+PAIR_CHUNK = 1 << 18  # (station, segment) pairs per vectorized block
+SIMPLIFY_FRACTION = 0.02  # allowed deviation of the simplified route, as a share of the buffer
+
+
+def parse_gpx(text):
+    """Track, route or waypoint coordinates from a GPX document, in file order."""
+    root = ET.fromstring(text)
+    points = []
+    for tag in ('trkpt', 'rtept', 'wpt'):
+        for element in root.iter():
+            if element.tag.rsplit('}', 1)[-1] == tag:
+                points.append((float(element.get('lat')), float(element.get('lon'))))
+        if points:
+            break
+    return points
+
+
+def parse_geojson(text):
+    """Coordinates of the (Multi)LineString in a GeoJSON geometry, Feature or FeatureCollection."""
+    data = json.loads(text)
+    if data.get('type') == 'FeatureCollection':
+        geometries = [feature.get('geometry') or {} for feature in data.get('features', [])]
+    elif data.get('type') == 'Feature':
+        geometries = [data.get('geometry') or {}]
+    else:
+        geometries = [data]
+    points = []
+    for geometry in geometries:
+        if geometry.get('type') == 'LineString':
+            lines = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiLineString':
+            lines = geometry['coordinates']
+        else:
+            continue
+        for line in lines:
+            points.extend((float(lat), float(lon)) for lon, lat, *_ in line)
+    return points
+
+
+def parse_route_file(name, data):
+    """Route points from an uploaded ``.gpx`` or ``.geojson``/``.json`` file."""
+    text = data.decode('utf-8') if isinstance(data, bytes) else data
+    if name.lower().endswith('.gpx'):
+        return parse_gpx(text)
+    return parse_geojson(text)
+
+
+def route_length_km(route):
+    """Cumulative great-circle distance (km) at each route vertex."""
+    route = np.asarray(route, dtype=np.float64).reshape(-1, 2)
+    steps = haversine_km(route[:-1, 0], route[:-1, 1], route[1:, 0], route[1:, 1])
+    return np.concatenate([[0.0], np.cumsum(steps)])
+
+
+def simplify_route(route, tolerance_km):
+    """Indices of the route vertices kept by Douglas-Peucker within ``tolerance_km``."""
+    route = np.asarray(route, dtype=np.float64)
+    if len(route) < 3 or tolerance_km <= 0:
+        return np.arange(len(route))
+    kx = KM_PER_DEG_LAT * np.cos(np.radians(route[:, 0].mean()))
+    x, y = route[:, 1] * kx, route[:, 0] * KM_PER_DEG_LAT
+    keep = np.zeros(len(route), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(route) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        seg_sq = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / seg_sq, 0.0, 1.0) if seg_sq > 0 else 0.0
+        dist = np.hypot(px - t * dx, py - t * dy)
+        worst = int(dist.argmax())
+        if dist[worst] > tolerance_km:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.extend([(first, split), (split, last)])
+    return np.flatnonzero(keep)
+
+
+def corridor_stations(df, index, route, buffer_km, allowed=None):
+    """Rows of ``df`` within ``buffer_km`` of ``route``, ordered along it.
+
+    Adds ``route_km`` (distance along the route to the closest point) and
+    ``detour_km`` (distance from the route) columns. ``index`` is keyed by
+    positional row number, as everywhere else in the app. Detours are measured
+    to the simplified route, so they are exact to ``SIMPLIFY_FRACTION`` of the
+    buffer.
+    """
+    route = np.asarray(route, dtype=np.float64)
+    if len(route) == 1:
+        route = np.vstack([route, route])
+    # Distances along the route come from the full track, the geometry from the simplified one.
+    kept = simplify_route(route, buffer_km * SIMPLIFY_FRACTION)
+    vertex_km = route_length_km(route)[kept]
+    route = route[kept]
+    starts, ends = route[:-1], route[1:]
+
+    # Candidates: stations inside each segment's bounding box grown by the buffer.
+    pad_lat = buffer_km / KM_PER_DEG_LAT
+    pad_lon = buffer_km / (KM_PER_DEG_LAT * np.maximum(np.cos(np.radians(np.abs(route[:, 0]).max())), 0.01))
+    candidates = [
+        np.asarray(index.in_bbox(min(a[0], b[0]) - pad_lat, min(a[1], b[1]) - pad_lon,
+                                 max(a[0], b[0]) + pad_lat, max(a[1], b[1]) + pad_lon), dtype=np.int64)
+        for a, b in zip(starts, ends)
+    ]
+    # One (station, segment) pair per box hit; stations far from a segment are never measured against it.
+    pair_positions = np.concatenate(candidates)
+    pair_segments = np.repeat(np.arange(len(candidates)), [len(c) for c in candidates])
+    if allowed is not None and len(pair_positions):
+        keep = np.asarray(allowed, dtype=bool)[pair_positions]
+        pair_positions, pair_segments = pair_positions[keep], pair_segments[keep]
+    if len(pair_positions) == 0:
+        return df.iloc[:0].assign(route_km=[], detour_km=[])
+
+    all_lats = df['lat'].to_numpy(dtype=np.float64)
+    all_lons = df['lon'].to_numpy(dtype=np.float64)
+    # Each segment gets its own projection scale so long routes stay accurate.
+    kx = KM_PER_DEG_LAT * np.cos(np.radians((starts[:, 0] + ends[:, 0]) / 2))
+    ax, ay = starts[:, 1] * kx, starts[:, 0] * KM_PER_DEG_LAT
+    dx, dy = ends[:, 1] * kx - ax, ends[:, 0] * KM_PER_DEG_LAT - ay
+    seg_sq = dx * dx + dy * dy
+    dist = np.empty(len(pair_positions))
+    along = np.empty(len(pair_positions))
+    for first in range(0, len(pair_positions), PAIR_CHUNK):
+        block = slice(first, first + PAIR_CHUNK)
+        seg = pair_segments[block]
+        pos = pair_positions[block]
+        px = all_lons[pos] * kx[seg] - ax[seg]
+        py = all_lats[pos] * KM_PER_DEG_LAT - ay[seg]
+        t = np.clip((px * dx[seg] + py * dy[seg]) / np.where(seg_sq[seg] > 0, seg_sq[seg], 1.0), 0.0, 1.0)
+        dist[block] = np.hypot(px - t * dx[seg], py - t * dy[seg])
+        along[block] = vertex_km[seg] + t * (vertex_km[seg + 1] - vertex_km[seg])
+
+    # Closest segment per station: sort by (station, distance) and keep each station's first pair.
+    order = np.lexsort((dist, pair_positions))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair_positions[order][1:] != pair_positions[order][:-1]
+    best = order[first]
+    best = best[dist[best] <= buffer_km]
+    matches = df.iloc[pair_positions[best]].copy()
+    matches['route_km'] = along[best]
+    matches['detour_km'] = dist[best]
+    return matches.sort_values(['route_km', 'detour_km'], kind='stable')
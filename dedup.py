@@ -0,0 +1,237 @@
+"""Duplicate station detection.
+
+Two stations are duplicates when they are within ``DUPLICATE_RADIUS_KM`` of
+each other and their names are at least ``NAME_SIMILARITY`` alike
+(``difflib`` ratio after lower-casing and collapsing whitespace). Names are
+only compared for stations that a spatial lookup has already found close.
+
+* ``find_duplicates`` checks one new station against the loaded frame (the
+  add form uses it to warn or merge).
+* ``DuplicateChecker`` does the same incrementally for bulk imports.
+* ``cluster_duplicates`` groups a whole dataset in O(n log n) with a
+  latitude sort-and-sweep and union-find instead of comparing every pair;
+  ``python dedup.py`` reports (and with ``--apply`` merges) the clusters in
+  a storage backend.
+"""
+import argparse
+import csv
+import difflib
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from geo_utils import haversine_km
+from spatial_index import GridIndex
+from station_frame import AMENITIES, new_station_id, parse_amenities, to_number
+from station_store import STATION_COLUMNS
+from storage import add_storage_arguments, storage_from_args
+
+DUPLICATE_RADIUS_KM = 0.05
+NAME_SIMILARITY = 0.85
+KM_PER_DEG_LAT_MIN = 110.57  # shortest degree of latitude (at the equator)
+# Fields where the newer non-blank value wins when records are merged.
+UPDATABLE_FIELDS = ['price', 'contact', 'status', 'operating_hours']
+
+
+def normalize_name(name):
+    return ' '.join(str(name).lower().split())
+
+
+def name_similarity(a, b):
+    """``difflib`` ratio of two station names, ignoring case and spacing."""
+    return difflib.SequenceMatcher(None, normalize_name(a), normalize_name(b)).ratio()
+
+
+def find_duplicates(df, index, name, lat, lon, radius_km=DUPLICATE_RADIUS_KM, similarity=NAME_SIMILARITY):
+    """Rows of ``df`` that duplicate a new station, nearest first, with a ``distance_m`` column.
+
+    ``index`` is keyed by positional row number, as everywhere else in the app.
+    """
+    ids, distances = index.within(lat, lon, radius_km)
+    ids = np.asarray(ids, dtype=np.int64)
+    names = df['name'].to_numpy()
+    keep = np.array([name_similarity(name, names[i]) >= similarity for i in ids], dtype=bool)
+    matches = df.iloc[ids[keep]].copy()
+    matches['distance_m'] = np.asarray(distances)[keep] * 1000
+    return matches
+
+
+class DuplicateChecker:
+    """Incremental duplicate lookups while stations are being added (bulk import)."""
+
+    def __init__(self, df=None, radius_km=DUPLICATE_RADIUS_KM, similarity=NAME_SIMILARITY):
+        self.radius_km = radius_km
+        self.similarity = similarity
+        self.index = GridIndex()
+        self.names = []
+        if df is not None and not df.empty:
+            lats = pd.to_numeric(df['lat'], errors='coerce').to_numpy()
+            lons = pd.to_numeric(df['lon'], errors='coerce').to_numpy()
+            for name, lat, lon in zip(df['name'], lats, lons):
+                self.add(name, lat, lon)
+
+    def add(self, name, lat, lon):
+        self.index.add(len(self.names), lat, lon)
+        self.names.append(normalize_name(name))
+
+    def find(self, name, lat, lon):
+        """Id of an existing near-duplicate, or ``None``."""
+        name = normalize_name(name)
+        ids, _ = self.index.within(lat, lon, self.radius_km)
+        for key in ids:
+            if difflib.SequenceMatcher(None, name, self.names[key]).ratio() >= self.similarity:
+                return int(key)
+        return None
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = np.arange(size)
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # The lower row becomes the root, so clusters keep their oldest station.
+            self.parent[max(a, b)] = min(a, b)
+
+
+def close_pairs(lats, lons, radius_km):
+    """Row pairs ``(first, second)`` closer than ``radius_km``, by a sort-and-sweep over latitude.
+
+    After one O(n log n) sort, step ``k`` compares every station with the
+    station ``k`` places further along, dropping stations once that neighbour
+    is more than ``radius_km`` north of them, so only pairs inside the
+    latitude band are ever measured.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+    order = valid[np.argsort(lats[valid], kind='stable')]
+    sorted_lats = lats[order]
+    band = radius_km / KM_PER_DEG_LAT_MIN
+    firsts, seconds = [], []
+    active = np.arange(len(order))
+    step = 1
+    while len(active):
+        active = active[active + step < len(order)]
+        active = active[sorted_lats[active + step] - sorted_lats[active] <= band]
+        a, b = order[active], order[active + step]
+        near = haversine_km(lats[a], lons[a], lats[b], lons[b]) <= radius_km
+        firsts.append(a[near])
+        seconds.append(b[near])
+        step += 1
+    if not firsts:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def cluster_duplicates(df, radius_km=DUPLICATE_RADIUS_KM, similarity=NAME_SIMILARITY):
+    """Cluster label (lowest row position in the cluster) for every row of ``df``.
+
+    Candidate pairs come from ``close_pairs``; names are compared only for
+    those, and matching pairs are joined with union-find.
+    """
+    lats = pd.to_numeric(df['lat'], errors='coerce').to_numpy(dtype=np.float64)
+    lons = pd.to_numeric(df['lon'], errors='coerce').to_numpy(dtype=np.float64)
+    names = [normalize_name(name) for name in df['name']]
+    groups = _UnionFind(len(df))
+    for first, second in zip(*close_pairs(lats, lons, radius_km)):
+        if difflib.SequenceMatcher(None, names[first], names[second]).ratio() >= similarity:
+            groups.union(int(first), int(second))
+    return np.array([groups.find(position) for position in range(len(df))], dtype=np.int64)
+
+
+def _blank(value):
+    return value is None or (isinstance(value, float) and np.isnan(value)) or str(value).strip() == ''
+
+
+def merge_records(existing, incoming):
+    """``existing`` updated with a newer report of the same station.
+
+    Name and coordinates are kept, newer non-blank ``UPDATABLE_FIELDS`` win,
+    amenities are combined and ratings are pooled by review count.
+    """
+    merged = dict(existing)
+    for field in ['name', 'type'] + UPDATABLE_FIELDS:
+        if field in incoming and not _blank(incoming[field]) and (field in UPDATABLE_FIELDS or _blank(merged.get(field))):
+            if field == 'price' and to_number(incoming[field]) <= 0:
+                continue  # the add form defaults to 0, which means "not given"
+            merged[field] = incoming[field]
+    amenities = set(parse_amenities(existing.get('amenities'))) | set(parse_amenities(incoming.get('amenities')))
+    merged['amenities'] = json.dumps([name for name in AMENITIES if name in amenities])
+    reviews = [int(to_number(r.get('reviews'))) for r in (existing, incoming)]
+    if sum(reviews):
+        ratings = [to_number(r.get('rating')) for r in (existing, incoming)]
+        merged['rating'] = round(sum(x * n for x, n in zip(ratings, reviews)) / sum(reviews), 2)
+        merged['reviews'] = sum(reviews)
+    return merged
+
+
+def deduplicate_records(records, radius_km=DUPLICATE_RADIUS_KM, similarity=NAME_SIMILARITY):
+    """``(kept_records, clusters)``: one merged record per cluster, in sheet order.
+
+    ``clusters`` lists the row positions of every cluster with more than one station.
+    """
+    if not records:
+        return [], []
+    labels = cluster_duplicates(pd.DataFrame(records), radius_km, similarity)
+    merged = {}
+    members = {}
+    for position, (label, record) in enumerate(zip(labels, records)):
+        merged[label] = merge_records(merged[label], record) if label in merged else dict(record)
+        members.setdefault(label, []).append(position)
+    clusters = [rows for rows in members.values() if len(rows) > 1]
+    return [merged[label] for label in sorted(merged)], clusters
+
+
+def write_backup(path, records):
+    """Station records as CSV in ``STATION_COLUMNS`` order."""
+    with open(path, 'x', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(STATION_COLUMNS)
+        writer.writerows([record.get(c, '') for c in STATION_COLUMNS] for record in records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find (and optionally merge) duplicate charging stations.")
+    add_storage_arguments(parser)
+    parser.add_argument('--radius-m', type=float, default=DUPLICATE_RADIUS_KM * 1000)
+    parser.add_argument('--similarity', type=float, default=NAME_SIMILARITY)
+    parser.add_argument('--apply', action='store_true',
+                        help="rewrite the stations table with each cluster merged into its first row")
+    parser.add_argument('--backup', help="CSV file for the current rows before --apply "
+                                         "(default: stations-backup-<timestamp>.csv)")
+    args = parser.parse_args(argv)
+
+    storage = storage_from_args(args)
+    records = storage.stations().get_all_records()
+    kept, clusters = deduplicate_records(records, args.radius_m / 1000, args.similarity)
+    for rows in clusters[:20]:
+        print("  " + " | ".join(f"row {row + 2}: {records[row]['name']}" for row in rows))
+    print(f"{len(records)} stations, {len(clusters)} duplicate clusters, {len(records) - len(kept)} redundant rows.")
+    if args.apply and clusters:
+        backup = args.backup or time.strftime('stations-backup-%Y%m%d-%H%M%S.csv')
+        write_backup(backup, records)
+        print(f"Saved the current {len(records)} rows to {backup}.")
+        # Rows that predate station ids get one now, so rating events can follow them.
+        for record in kept:
+            if not str(record.get('station_id') or '').strip():
+                record['station_id'] = new_station_id()
+        # Row numbers shift, so run this while the app is idle and its cache will reload.
+        storage.replace_records(storage.stations(), STATION_COLUMNS, kept)
+        print(f"Rewrote stations: {len(kept)} rows.")
+
+
+
+if __name__ == '__main__':
+    main()
@@ -1,114 +1,79 @@
 import math
 import streamlit as st
+
+# Must be the first Streamlit command
+st.set_page_config(
+    page_title="Freddie - EV Charger Buddy",
+    page_icon="⚡",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
 import pandas as pd
-import folium
-from folium.plugins import MarkerCluster, Fullscreen, LocateControl
-from streamlit_folium import st_folium
-from geopy.distance import geodesic
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import time
 from datetime import datetime
+import base64
 import json
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import os
 import random
 import string
 import streamlit.components.v1 as components
+from station_store import StationStore, DEFAULT_TTL
+from station_frame import AMENITIES, amenity_text, new_station_id, normalize_stations, station_key
+from station_query import StationQueryEngine
+from spatial_index import GridIndex, nearest_stations
+from corridor import corridor_stations, parse_route_file
+from validation import has_required_fields, is_on_land
+from bulk_io import export_bytes, frame_records, import_stations, iter_chunks
+from dedup import UPDATABLE_FIELDS, find_duplicates, merge_records
+from geocoder import GeocodingService, NominatimBackend
+from write_queue import WriteQueue
+from ratings import RatingIndex, rating_event
+from storage import open_storage
+import perf
+# folium, streamlit_folium and the map layer modules are imported by the pages
+# that draw maps: folium alone takes about a second to import.
 
+# Time this rerun's stages (see perf.py); finished at the bottom of the script
+perf.begin()
 
-# Custom CSS for blue/black electric theme
-st.markdown("""
-    <style>
-    body, .stApp {
-        background: linear-gradient(135deg, #0f2027 0%, #2c5364 100%) !important;
-        color: #e0e6f7 !important;
-    }
-    .stButton>button {
-        background-color: #00c6ff !important;
-        color: #fff !important;
-        border-radius: 8px;
-        font-weight: bold;
-        border: none;
-        box-shadow: 0 0 10px #00c6ff44;
-        transition: background 0.3s;
-    }
-    .stButton>button:hover {
-        background-color: #0072ff !important;
-        box-shadow: 0 0 20px #00c6ff99;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        background: #101820;
-        border-radius: 8px 8px 0 0;
-    }
-    .stTabs [data-baseweb="tab"] {
-        color: #00c6ff;
-        font-weight: bold;
-    }
-    .stTabs [aria-selected="true"] {
-        background: #00c6ff;
-        color: #fff;
-    }
-    .stMarkdown, .stTextInput, .stNumberInput, .stSelectbox, .stMultiselect {
-        background: #181f2a !important;
-        color: #e0e6f7 !important;
-        border-radius: 8px;
-    }
-    .stAlert, .stSuccess, .stError, .stWarning, .stInfo {
-        border-radius: 8px;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# --- Splash screen with sound and animation ---
-splash_html = f'''
-<div id="splash" style="position:fixed;top:0;left:0;width:100vw;height:100vh;z-index:9999;
-    background: url('https://plus.unsplash.com/premium_photo-1733259834058-e61e2d794897?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.1.0&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D') center center/cover no-repeat, #0f2027;
-    display:flex;flex-direction:column;align-items:center;justify-content:center;">
-    <audio id="splash-audio" src="https://cdn.pixabay.com/audio/2022/07/26/audio_124bfa4c3b.mp3"></audio>
-    <h1 style="color:#00c6ff;font-size:1.3rem;font-family:sans-serif;letter-spacing:2px;
-        margin:0 0 8px 0;padding:0;line-height:1.1;"></h1>
-</div>
-<script>
-window.onload = function() {{
-    var audio = document.getElementById('splash-audio');
-    audio.volume = 1.0;
-    audio.play().then(()=>{{
-        setTimeout(function() {{
-            var splash = document.getElementById('splash');
-            splash.style.transition = 'opacity 1s';
-            splash.style.opacity = 0;
-            setTimeout(function(){{ splash.style.display = 'none'; }}, 1000);
-        }}, 2200);
-    }});
-}}
-</script>
-'''
-components.html(splash_html, height=350)
-
-
-
-
-def safe_rating_convert(rating_value):
-    """Safely convert rating value to integer, handling all edge cases."""
+def app_setting(name, default=None):
+    """Setting from the EV_<NAME> environment variable, then st.secrets, then ``default``."""
+    env_value = os.environ.get(f"EV_{name.upper()}")
+    if env_value is not None:
+        return env_value
     try:
-        if rating_value is None or rating_value == '' or (isinstance(rating_value, float) and math.isnan(rating_value)):
-            return 0
-        rating_str = str(rating_value).strip()
-        if not rating_str or rating_str.lower() == 'nan':
-            return 0
-        return int(float(rating_str))
-    except (ValueError, TypeError, AttributeError):
-        return 0
-
-def safe_json_loads(val):
-    try:
-        if not val or val == '' or val is None:
-            return []
-        return json.loads(val)
-    except Exception:
-        return []
+        return st.secrets.get(name, default)
+    except Exception:  # no secrets file, e.g. running offline against SQLite
+        return default
+
+# Theme and splash assets are local files, read once per server process
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+@st.cache_resource(show_spinner=False)
+def load_asset(name, binary=False):
+    with open(os.path.join(ASSETS_DIR, name), "rb" if binary else "r", encoding=None if binary else "utf-8") as f:
+        return f.read()
+
+# Custom CSS for blue/black electric theme
+st.markdown(f"<style>{load_asset('theme.css')}</style>", unsafe_allow_html=True)
+
+# --- Splash screen with animation, once per session ---
+# (optional sound: splash_sound setting / EV_SPLASH_SOUND, an audio URL)
+if not st.session_state.get('splash_shown'):
+    st.session_state.splash_shown = True
+    splash_image = base64.b64encode(load_asset("ev_header.jpg", binary=True)).decode("ascii")
+    splash_html = (load_asset("splash.html")
+                   .replace("{image}", f"data:image/jpeg;base64,{splash_image}")
+                   .replace("{sound}", app_setting("splash_sound", "")))
+    components.html(splash_html, height=350)
+
+def rating_label(stats):
+    """Stars plus review count for a ``(count, mean)`` aggregate."""
+    count, mean = stats
+    if not count:
+        return "No ratings yet"
+    return f"{'⭐' * int(round(mean))} ({mean:.1f} from {count} reviews)"
 
 def generate_verification_code():
     """Generate a 6-digit verification code"""
@@ -116,6 +81,10 @@ def generate_verification_code():
 
 def send_verification_email(email, code):
     """Send verification code via email"""
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         # Email configuration
         sender_email = "your-app-email@gmail.com"  # Replace with your app's email
@@ -161,85 +130,181 @@ if 'seller_email' not in st.session_state:
 if 'verification_step' not in st.session_state:
     st.session_state.verification_step = 'add_charger'  # Temporarily set to final step
 
-# Main app
-st.set_page_config(
-    page_title="Freddie - EV Charger Buddy",
-    page_icon="⚡",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
 st.title("⚡ Freddie - EV Charger Buddy")
 st.markdown("Find and manage electric vehicle charging stations near you!")
 
-# Create tabs for different sections
-tab1, tab2, tab3 = st.tabs(["🗺️ Map View", "📝 Add Charger", "🔍 Find Nearest"])
+# Page navigation: unlike st.tabs, only the selected page's code runs on a rerun
+MAP_PAGE = "🗺️ Map View"
+ADD_PAGE = "📝 Add Charger"
+NEAREST_PAGE = "🔍 Find Nearest"
+page = st.radio("Section", [MAP_PAGE, ADD_PAGE, NEAREST_PAGE], horizontal=True,
+                key="nav", label_visibility="collapsed")
+
+
+def remembered(widget, *args, key, **kwargs):
+    """Call ``widget`` so its value survives visits to the other pages.
+
+    Streamlit drops the state of widgets that aren't rendered in a run, so
+    the value is also kept under ``_<key>`` and put back when the page returns.
+    """
+    backup = '_' + key
+    if key not in st.session_state and backup in st.session_state:
+        st.session_state[key] = st.session_state[backup]
+        kwargs.pop('value', None)  # the restored state wins; passing both makes Streamlit warn
+    value = widget(*args, key=key, **kwargs)
+    st.session_state[backup] = value
+    return value
+
 
 # Default Karachi coordinates
 KARACHI_LAT = 24.8607
 KARACHI_LON = 67.0011
 
-# Google Sheets connection
+# Nearest results get an exact geodesic distance; the rest keep haversine
+REFINE_TOP_K = 50
+
+# Find Nearest keeps the closest RESULTS_LIMIT matches and shows them a page at a time
+RESULTS_LIMIT = 100
+RESULTS_PAGE_SIZE = 10
+
+# Storage connection: Google Sheets by default, or a local SQLite file
+# (storage = "sqlite:///stations.db" in secrets, or EV_STORAGE)
+@st.cache_resource(show_spinner=False)
+def get_storage():
+    """Connect once per server process."""
+    url = app_setting("storage", "sheets")
+    service_account = st.secrets["gcp_service_account"] if url == "sheets" else None
+    with perf.span('connect'):
+        return open_storage(url, service_account)
+
+@st.cache_resource(show_spinner=False)
+def get_perf_sink():
+    """JSON-lines file getting one line per rerun (perf_log setting / EV_PERF_LOG), or None."""
+    path = app_setting("perf_log")
+    return perf.JsonlSink(path) if path else None
+
+@st.cache_resource(show_spinner=False)
+def get_station_store():
+    """Station store shared across sessions."""
+    return StationStore(get_storage().stations(), ttl=float(app_setting("station_cache_ttl", DEFAULT_TTL)))
+
 try:
-    # ... your credentials and gspread logic ...
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    google_creds_dict = {
-        "type": st.secrets["gcp_service_account"]["type"],
-        "project_id": st.secrets["gcp_service_account"]["project_id"],
-        "private_key_id": st.secrets["gcp_service_account"]["private_key_id"],
-        "private_key": st.secrets["gcp_service_account"]["private_key"].replace('\\n', '\n'),
-        "client_email": st.secrets["gcp_service_account"]["client_email"],
-        "client_id": st.secrets["gcp_service_account"]["client_id"],
-        "auth_uri": st.secrets["gcp_service_account"]["auth_uri"],
-        "token_uri": st.secrets["gcp_service_account"]["token_uri"],
-        "auth_provider_x509_cert_url": st.secrets["gcp_service_account"]["auth_provider_x509_cert_url"],
-        "client_x509_cert_url": st.secrets["gcp_service_account"]["client_x509_cert_url"]
-    }
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(google_creds_dict, scope)
-    client = gspread.authorize(creds)
-    sheet = client.open('ev_chargers').sheet1
+    store = get_station_store()
 except Exception as e:
-    st.error(f"Error connecting to Google Sheets: {e}")
+    st.error(f"Error connecting to station storage: {e}")
     st.stop()
 
-# Load data
+@st.cache_resource(show_spinner=False)
+def get_write_queue():
+    """Background writer that batches station writes from all sessions."""
+    return WriteQueue(get_station_store().sheet)
+
+@st.cache_resource(show_spinner=False)
+def get_rating_queue():
+    """Background writer for the rating event log."""
+    return WriteQueue(get_storage().ratings())
+
+WRITE_QUEUES = {'stations': get_write_queue, 'ratings': get_rating_queue}
+
+def watch_writes(name):
+    """The named write queue; writes it drops from now on are reported to this session."""
+    queue = WRITE_QUEUES[name]()
+    st.session_state.setdefault('write_failures_seen', {}).setdefault(name, queue.failed)
+    return queue
+
+def submit_rating(position, row, value):
+    """Log a rating event and queue the station's new rating/reviews cells."""
+    count, mean = store.record_rating(position, row, value)
+    sheet_row = store.sheet_row(position)
+    watch_writes('ratings').enqueue_row(rating_event(sheet_row, row, value))
+    if sheet_row is not None:
+        watch_writes('stations').enqueue_update(sheet_row, {'rating': round(mean, 1), 'reviews': count})
+    return count, mean
+
+def add_station(new_data):
+    """Queue the sheet write and show the station right away."""
+    watch_writes('stations').enqueue_row(list(new_data.values()))
+    store.add_local_row(list(new_data.values()))
+
+def merge_station(position, new_data):
+    """Fold a duplicate submission into an existing station; False if that row isn't in the sheet yet."""
+    sheet_row = store.sheet_row(position)
+    if sheet_row is None:
+        return False
+    existing = frame_records(df.iloc[[position]])[0]
+    merged = merge_records(existing, new_data)
+    changes = {k: merged[k] for k in UPDATABLE_FIELDS + ['amenities'] if merged[k] != existing[k]}
+    if changes:
+        watch_writes('stations').enqueue_update(sheet_row, changes)
+        store.update_local_row(position, changes)
+    return True
+
+@st.cache_resource(show_spinner=False)
+def get_geocoder():
+    """One geocoding service (cache, rate limiter) shared by all sessions."""
+    return GeocodingService(NominatimBackend(user_agent="ev_charger_finder"))
+
+# Load data (served from the store's cache until the TTL expires)
 try:
-    data = sheet.get_all_records()
-    df = pd.DataFrame(data)
+    # One snapshot per rerun: positions in the index always match this frame.
+    df, station_index, station_query, station_ratings, station_version = store.load()
     # ... your header and cleaning logic ...
 except Exception as e:
     st.error(f"Error loading data: {str(e)}")
     df = pd.DataFrame()  # Always define df, even if empty
+    station_index = GridIndex()
+    station_ratings = RatingIndex()
+    station_query = StationQueryEngine(normalize_stations(df))
+    station_version = 'empty'
+
+# Rating cells the sheet was behind on when it was reloaded (e.g. a station rated before its row was written)
+for sheet_row, cells in store.take_rating_updates():
+    get_write_queue().enqueue_update(sheet_row, cells)
+
+# Sheet writes run in the background; tell the session when one was given up on
+for queue_name, seen_failures in st.session_state.get('write_failures_seen', {}).items():
+    write_queue = WRITE_QUEUES[queue_name]()
+    if write_queue.failed > seen_failures:
+        st.warning(f"Some changes could not be saved to the sheet ({write_queue.last_error}). "
+                   "Please submit them again.")
+        st.session_state.write_failures_seen[queue_name] = write_queue.failed
+
+if page == MAP_PAGE:
+    import folium
+    from folium.plugins import Fullscreen, LocateControl
+    from streamlit_folium import st_folium
+    from viewport import add_layer_assets, approx_bounds, parse_bounds, viewport_layer
 
-with tab1:
     st.markdown("### View Charging Stations")
     st.markdown("Explore charging stations on the interactive map below.")
-    map_center = [st.session_state.add_lat if 'add_lat' in st.session_state else KARACHI_LAT,
-                  st.session_state.add_lon if 'add_lon' in st.session_state else KARACHI_LON]
-    m = folium.Map(location=map_center, zoom_start=12, tiles='CartoDB positron')
-    marker_cluster = MarkerCluster().add_to(m)
-    if not df.empty:
-        for _, row in df.iterrows():
-            popup_content = f"""
-            <div style='font-family: Arial, sans-serif; padding: 10px;'>
-                <h3 style='color: #4CAF50; margin-bottom: 10px;'>{row['name']}</h3>
-                <p style='margin: 5px 0;'><b>Type:</b> {row['type']}</p>
-                <p style='margin: 5px 0;'><b>Price:</b> Rs. {row['price']}/kWh</p>
-                <p style='margin: 5px 0;'><b>Status:</b> {row['status']}</p>
-                <p style='margin: 5px 0;'><b>Rating:</b> {'⭐' * safe_rating_convert(row.get('rating'))}</p>
-                <p style='margin: 5px 0;'><b>Contact:</b> {row['contact']}</p>
-                <p style='margin: 5px 0;'><b>Amenities:</b> {', '.join(safe_json_loads(row.get('amenities', '[]')))}</p>
-            </div>
-            """
-            folium.Marker(
-                [row['lat'], row['lon']],
-                popup=folium.Popup(popup_content, max_width=300),
-                tooltip=row['name']
-            ).add_to(marker_cluster)
-    Fullscreen().add_to(m)
-    LocateControl().add_to(m)
-    st_folium(m, use_container_width=True, height=600)
-
-with tab2:
+    # The last reported viewport is kept outside the map's widget state, which is dropped on other pages
+    map_view = st.session_state.get('station_map') or st.session_state.get('map_view') or {}
+    st.session_state.map_view = map_view
+    if 'station_map' not in st.session_state or 'map_start' not in st.session_state:
+        # (Re)opening the page: start where the user left the map. Fixed while on the page,
+        # since a new location would re-render the map.
+        saved_bbox = parse_bounds(map_view.get('bounds'))
+        if saved_bbox:
+            start_center = [(saved_bbox[0] + saved_bbox[2]) / 2, (saved_bbox[1] + saved_bbox[3]) / 2]
+        else:
+            start_center = [st.session_state.add_lat if 'add_lat' in st.session_state else KARACHI_LAT,
+                            st.session_state.add_lon if 'add_lon' in st.session_state else KARACHI_LON]
+        st.session_state.map_start = (start_center, map_view.get('zoom') or 12)
+    map_center, map_start_zoom = st.session_state.map_start
+    # Only stations in the last reported viewport are sent to the browser
+    map_zoom = map_view.get('zoom') or map_start_zoom
+    map_bbox = parse_bounds(map_view.get('bounds')) or approx_bounds(map_center, map_zoom)
+    with perf.span('map_build'):
+        m = folium.Map(location=map_center, zoom_start=map_start_zoom, tiles='CartoDB positron')
+        add_layer_assets(m)
+        Fullscreen().add_to(m)
+        LocateControl().add_to(m)
+        station_layer = viewport_layer(df, station_index, map_bbox, map_zoom, version=station_version)
+    with perf.span('render'):
+        st_folium(m, key='station_map', feature_group_to_add=station_layer,
+                  use_container_width=True, height=600, returned_objects=["bounds", "zoom"])
+
+if page == ADD_PAGE:
     st.markdown("### Add New Charging Station")
     st.markdown("""
     Fill in the details below to add a new charging station.
@@ -288,6 +353,9 @@ with tab2:
     st.markdown(st_folium_js, unsafe_allow_html=True)
 
     # Map picker
+    import folium
+    from streamlit_folium import st_folium
+
     st.write("**Pick location on map:** (drag the marker)")
     m_picker = folium.Map(location=[st.session_state.add_lat, st.session_state.add_lon], zoom_start=12)
     marker = folium.Marker([st.session_state.add_lat, st.session_state.add_lon], draggable=True)
@@ -297,11 +365,6 @@ with tab2:
         st.session_state.add_lat = map_picker_data["last_clicked"]["lat"]
         st.session_state.add_lon = map_picker_data["last_clicked"]["lng"]
 
-    # Sanity check for land (simple bounding box for Karachi)
-    def is_on_land(lat, lon):
-        # Karachi bounding box (approximate)
-        return 24.7 <= lat <= 25.1 and 66.8 <= lon <= 67.4
-
     # --- All form fields and submit button must be inside the form ---
     with st.form("add_charger_form"):
         col1, col2 = st.columns(2)
@@ -319,7 +382,7 @@ with tab2:
             status = st.selectbox("Status", ["Available", "In Use", "Out of Service"])
             amenities = st.multiselect(
                 "Amenities",
-                ["Restrooms", "Food", "Shopping", "WiFi", "Covered", "24/7"]
+                AMENITIES
             )
             operating_hours = st.text_input("Operating Hours (e.g., '24/7' or '9 AM - 10 PM')")
 
@@ -330,8 +393,8 @@ with tab2:
         submit_button = st.form_submit_button("Add Charging Station")
         if submit_button:
             if not is_on_land(lat, lon):
-                st.error("The selected location appears to be in the sea or outside Karachi. Please pick a valid land location in Karachi.")
-            elif name and lat != 0 and lon != 0 and (charger_type != "Other" or (charger_type == "Other" and charger_desc.strip() != "")):
+                st.error("The selected location appears to be in the sea or outside the areas we cover. Please pick a valid land location.")
+            elif has_required_fields(name, lat, lon, charger_type if charger_type != "Other" else charger_desc):
                 try:
                     # Prepare data
                     new_data = {
@@ -346,21 +409,81 @@ with tab2:
                         'reviews': 0,
                         'amenities': json.dumps(amenities),
                         'operating_hours': operating_hours,
-                        'verified_email': 'pending_verification'  # Placeholder for now
+                        'verified_email': 'pending_verification',  # Placeholder for now
+                        'station_id': new_station_id(),
                     }
-                    # Add to Google Sheet
-                    sheet.append_row(list(new_data.values()))
-                    st.success("Charging station added successfully!")
-                    # Reset form fields to defaults (refresh form)
-                    st.session_state.add_lat = KARACHI_LAT
-                    st.session_state.add_lon = KARACHI_LON
-                    st.experimental_rerun()
+                    # Same place, similar name: ask before adding another copy
+                    if not find_duplicates(df, station_index, name, lat, lon).empty:
+                        st.session_state.pending_station = new_data
+                    else:
+                        add_station(new_data)
+                        st.success("Charging station added successfully!")
+                        # Reset form fields to defaults (refresh form)
+                        st.session_state.add_lat = KARACHI_LAT
+                        st.session_state.add_lon = KARACHI_LON
+                        st.rerun()
                 except Exception as e:
                     st.error(f"Error adding charging station: {str(e)}")
             else:
                 st.error("Please fill in all required fields (name, latitude, longitude, and charger description if 'Other' is selected)")
 
-with tab3:
+    pending = st.session_state.get('pending_station')
+    if pending:
+        duplicates = find_duplicates(df, station_index, pending['name'], pending['lat'], pending['lon'])
+        st.warning(f"**{pending['name']}** looks like a station that is already listed. "
+                   "Update the existing station with your details, or add it anyway if it really is a different one.")
+        st.dataframe(
+            duplicates.assign(distance_m=duplicates['distance_m'].round())[['name', 'distance_m', 'type', 'status']]
+            .rename(columns={'name': 'Station', 'distance_m': 'Distance (m)', 'type': 'Type', 'status': 'Status'}),
+            hide_index=True,
+        )
+        col_merge, col_add, col_cancel = st.columns(3)
+        if col_merge.button("Update existing station", key="dup_merge", disabled=duplicates.empty):
+            if merge_station(int(duplicates.index[0]), pending):
+                del st.session_state.pending_station
+                st.session_state.add_lat = KARACHI_LAT
+                st.session_state.add_lon = KARACHI_LON
+                st.rerun()
+            else:
+                st.info("That station is still being saved. Please try again in a moment.")
+        if col_add.button("Add as a new station", key="dup_add"):
+            add_station(pending)
+            del st.session_state.pending_station
+            st.session_state.add_lat = KARACHI_LAT
+            st.session_state.add_lon = KARACHI_LON
+            st.rerun()
+        if col_cancel.button("Cancel", key="dup_cancel"):
+            del st.session_state.pending_station
+            st.rerun()
+
+    with st.expander("Bulk import / export"):
+        st.markdown("Upload a CSV or GeoJSON file of stations (columns as in the export). "
+                    "Invalid rows and stations already on the map are skipped.")
+        bulk_file = st.file_uploader("Stations file", type=["csv", "geojson", "json"], key="bulk_file")
+        if bulk_file is not None and st.button("Import stations", key="bulk_import"):
+            with st.spinner("Importing stations..."):
+                try:
+                    summary = import_stations(iter_chunks(bulk_file.name, bulk_file), store.sheet, existing=df)
+                except Exception as e:
+                    st.error(f"Error importing stations: {str(e)}")
+                else:
+                    store.invalidate()
+                    st.success(f"Imported {summary['imported']} of {summary['read']} stations; "
+                               f"skipped {summary['duplicates']} duplicates and {len(summary['invalid'])} invalid rows.")
+                    if summary['errors']:
+                        st.warning(f"{summary['errors']} stations could not be saved to the sheet.")
+                    if summary['invalid']:
+                        st.dataframe(pd.DataFrame(summary['invalid'], columns=['row', 'name', 'reason']), hide_index=True)
+        export_format = remembered(st.radio, "Export format", ["CSV", "GeoJSON"], horizontal=True,
+                                   key="bulk_export_format")
+        export_name = "ev_chargers.csv" if export_format == "CSV" else "ev_chargers.geojson"
+        # Deferred: the file is only built when the button is clicked. Exports the stored
+        # records (as the CLI does), not the typed frame with its rounded values and unsaved rows.
+        st.download_button("Download stations",
+                           data=lambda: export_bytes(export_name, store.sheet.get_all_records()),
+                           file_name=export_name, key="bulk_export", disabled=df.empty, on_click="ignore")
+
+if page == NEAREST_PAGE:
     st.markdown("### Find Nearest Charging Stations")
     st.markdown("Enter your location to find the nearest charging stations.")
     if 'user_lat' not in st.session_state:
@@ -369,9 +492,11 @@ with tab3:
         st.session_state.user_lon = KARACHI_LON
     col1, col2 = st.columns([2, 1])
     with col1:
-        search_query = st.text_input("Enter location (e.g., 'New York, NY')")
-        user_lat = st.number_input("Or enter your Latitude", format="%.6f", value=st.session_state.user_lat, key="user_lat_input")
-        user_lon = st.number_input("Or enter your Longitude", format="%.6f", value=st.session_state.user_lon, key="user_lon_input")
+        search_query = remembered(st.text_input, "Enter location (e.g., 'New York, NY')", key="search_query")
+        user_lat = remembered(st.number_input, "Or enter your Latitude", format="%.6f", value=st.session_state.user_lat,
+                              key="user_lat_input")
+        user_lon = remembered(st.number_input, "Or enter your Longitude", format="%.6f", value=st.session_state.user_lon,
+                              key="user_lon_input")
         st.markdown('''
         <script>
         function getUserLocation() {
@@ -403,40 +528,34 @@ with tab3:
         </script>
         ''', unsafe_allow_html=True)
     with col2:
-        max_distance = st.slider("Maximum Distance (km)", 1, 100, 10)
+        max_distance = remembered(st.slider, "Maximum Distance (km)", 1, 100, value=10, key="max_distance")
+    with st.expander("Filters"):
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            filter_types = remembered(st.multiselect, "Charger type", sorted(station_query.types), key="filter_types")
+            filter_statuses = remembered(st.multiselect, "Status", sorted(station_query.statuses), key="filter_statuses")
+            filter_max_price = remembered(st.number_input, "Max price per kWh (PKR, 0 = any)", min_value=0.0, value=0.0,
+                                          format="%.2f", key="filter_max_price")
+        with filter_col2:
+            filter_amenities = remembered(st.multiselect, "Must have", AMENITIES, key="filter_amenities")
+            filter_open_now = remembered(st.checkbox, "Open now", key="filter_open_now",
+                                         help="Stations without recognisable operating hours are hidden.")
+    # Filters are intersected on the precomputed indexes before any distance is computed
+    allowed = station_query.match(
+        types=filter_types,
+        statuses=filter_statuses,
+        amenities=filter_amenities,
+        max_price=filter_max_price or None,
+        open_now=filter_open_now,
+    )
+    # Resolve the search origin: typed location first, then coordinates
+    origin = None
     if search_query:
         if not df.empty:
             try:
-                from geopy.geocoders import Nominatim
-                geolocator = Nominatim(user_agent="ev_charger_finder")
-                location = geolocator.geocode(search_query)
+                location = get_geocoder().geocode(search_query)
                 if location:
-                    df['distance'] = df.apply(
-                        lambda row: geodesic(
-                            (location.latitude, location.longitude),
-                            (row['lat'], row['lon'])
-                        ).kilometers,
-                        axis=1
-                    )
-                    nearby_stations = df[df['distance'] <= max_distance].sort_values('distance')
-                    if not nearby_stations.empty:
-                        st.success(f"Found {len(nearby_stations)} charging stations within {max_distance}km")
-                        for idx, row in nearby_stations.iterrows():
-                            with st.expander(f"{row['name']} ({row['distance']:.1f}km away)"):
-                                st.markdown(f"""
-                                - **Type:** {row['type']}
-                                - **Price:** Rs. {row['price']}/kWh
-                                - **Status:** {row['status']}
-                                - **Rating:** {'⭐' * safe_rating_convert(row.get('rating'))}
-                                - **Contact:** {row['contact']}
-                                - **Amenities:** {', '.join(safe_json_loads(row.get('amenities', '[]')))}
-                                - **Operating Hours:** {row.get('operating_hours', 'Not specified')}
-                                """)
-                                rating = st.slider("Rate this charger", 1, 5, 3, key=f"rating_slider_{idx}")
-                                if st.button(f"Submit Rating for {row['name']}", key=f"rate_btn_{idx}"):
-                                    st.success(f"Thank you for rating {row['name']} with {rating} stars!")
-                    else:
-                        st.warning(f"No charging stations found within {max_distance}km")
+                    origin = (location.latitude, location.longitude)
                 else:
                     st.error("Location not found. Please try a different search query.")
             except Exception as e:
@@ -445,34 +564,131 @@ with tab3:
             st.warning("No data available to search.")
     elif user_lat and user_lon:
         if not df.empty:
-            try:
-                df['distance'] = df.apply(
-                    lambda row: geodesic(
-                        (user_lat, user_lon),
-                        (row['lat'], row['lon'])
-                    ).kilometers,
-                    axis=1
-                )
-                nearby_stations = df[df['distance'] <= max_distance].sort_values('distance')
+            origin = (user_lat, user_lon)
+        else:
+            st.warning("No data available to search.")
+
+    if origin is not None:
+        try:
+            with perf.span('distance'):
+                nearby_stations, total_found = nearest_stations(df, station_index, origin[0], origin[1], max_distance,
+                                                                limit=RESULTS_LIMIT, refine_top_k=REFINE_TOP_K,
+                                                                allowed=allowed)
+            with perf.span('render'):
                 if not nearby_stations.empty:
-                    st.success(f"Found {len(nearby_stations)} charging stations within {max_distance}km")
-                    for idx, row in nearby_stations.iterrows():
-                        with st.expander(f"{row['name']} ({row['distance']:.1f}km away)"):
-                            st.markdown(f"""
-                            - **Type:** {row['type']}
-                            - **Price:** Rs. {row['price']}/kWh
-                            - **Status:** {row['status']}
-                            - **Rating:** {'⭐' * safe_rating_convert(row.get('rating'))}
-                            - **Contact:** {row['contact']}
-                            - **Amenities:** {', '.join(safe_json_loads(row.get('amenities', '[]')))}
-                            - **Operating Hours:** {row.get('operating_hours', 'Not specified')}
-                            """)
-                            rating = st.slider("Rate this charger", 1, 5, 3, key=f"rating_slider_{idx}")
-                            if st.button(f"Submit Rating for {row['name']}", key=f"rate_btn_{idx}"):
-                                st.success(f"Thank you for rating {row['name']} with {rating} stars!")
+                    shown = f" (showing the nearest {len(nearby_stations)})" if total_found > len(nearby_stations) else ""
+                    st.success(f"Found {total_found} charging stations within {max_distance}km{shown}")
+
+                    # Start from the first page whenever the search itself changes
+                    results_key = (origin, max_distance, tuple(nearby_stations.index[:RESULTS_PAGE_SIZE]))
+                    if st.session_state.get('results_key') != results_key:
+                        st.session_state.results_key = results_key
+                        st.session_state.results_page = 0
+                    page_count = math.ceil(len(nearby_stations) / RESULTS_PAGE_SIZE)
+                    results_page = min(st.session_state.get('results_page', 0), page_count - 1)
+                    page_rows = nearby_stations.iloc[results_page * RESULTS_PAGE_SIZE:(results_page + 1) * RESULTS_PAGE_SIZE]
+
+                    # One radio per page; details and rating widgets exist only for the picked station
+                    selected = st.radio(
+                        "Stations",
+                        list(page_rows.index),
+                        format_func=lambda idx: f"{page_rows.at[idx, 'name']} ({page_rows.at[idx, 'distance']:.1f}km away)",
+                        key=f"results_pick_{results_page}",
+                    )
+                    row = page_rows.loc[selected]
+                    with st.expander(f"{row['name']} ({row['distance']:.1f}km away)", expanded=True):
+                        st.markdown(f"""
+                        - **Type:** {row['type']}
+                        - **Price:** Rs. {row['price']}/kWh
+                        - **Status:** {row['status']}
+                        - **Rating:** {rating_label(station_ratings.get(station_key(row)))}
+                        - **Contact:** {row['contact']}
+                        - **Amenities:** {amenity_text(row)}
+                        - **Operating Hours:** {row.get('operating_hours', 'Not specified')}
+                        """)
+                        rating = st.slider("Rate this charger", 1, 5, 3, key=f"rating_slider_{selected}")
+                        if st.button(f"Submit Rating for {row['name']}", key=f"rate_btn_{selected}"):
+                            count, mean = submit_rating(selected, row, rating)
+                            st.success(f"Thank you for rating {row['name']} with {rating} stars! Average is now {mean:.1f} from {count} reviews.")
+
+                    if page_count > 1:
+                        prev_col, page_col, next_col = st.columns([1, 2, 1])
+                        prev_col.button("◀ Previous", key="results_prev", disabled=results_page == 0,
+                                        on_click=st.session_state.update, kwargs={"results_page": results_page - 1})
+                        page_col.markdown(f"Page {results_page + 1} of {page_count}")
+                        next_col.button("Next ▶", key="results_next", disabled=results_page >= page_count - 1,
+                                        on_click=st.session_state.update, kwargs={"results_page": results_page + 1})
                 else:
                     st.warning(f"No charging stations found within {max_distance}km")
-            except Exception as e:
-                st.error(f"Error searching for locations: {str(e)}")
-        else:
-            st.warning("No data available to search.")
+        except Exception as e:
+            st.error(f"Error searching for locations: {str(e)}")
+
+    # --- Chargers along a trip: stations within a corridor around a route ---
+    st.markdown("### Chargers Along Your Trip")
+    st.markdown("Enter a start and destination, or upload a GPX/GeoJSON track, to list chargers along the way.")
+    trip_col1, trip_col2 = st.columns([2, 1])
+    with trip_col1:
+        trip_from = remembered(st.text_input, "From", key="trip_from")
+        trip_to = remembered(st.text_input, "To", key="trip_to")
+        trip_file = st.file_uploader("Or upload a route", type=["gpx", "geojson", "json"], key="trip_file")
+    with trip_col2:
+        trip_buffer = remembered(st.slider, "Distance from route (km)", 1, 20, value=3, key="trip_buffer")
+    route = None
+    try:
+        if trip_file is not None:
+            route = parse_route_file(trip_file.name, trip_file.getvalue())
+            if len(route) < 2:
+                st.error("The uploaded file has no route or track with at least two points.")
+                route = None
+        elif trip_from and trip_to:
+            start = get_geocoder().geocode(trip_from)
+            end = get_geocoder().geocode(trip_to)
+            if start and end:
+                route = [(start.latitude, start.longitude), (end.latitude, end.longitude)]
+            else:
+                st.error("Start or destination not found. Please try a different search query.")
+    except Exception as e:
+        st.error(f"Error reading route: {str(e)}")
+    if route is not None and not df.empty:
+        try:
+            # Reruns with the same route, buffer, filters and data reuse the last result
+            trip_key = (hash(tuple(map(tuple, route))), trip_buffer, station_version, hash(allowed.tobytes()))
+            cached_trip = st.session_state.get('trip_result')
+            if cached_trip is not None and cached_trip[0] == trip_key:
+                trip_stations = cached_trip[1]
+            else:
+                with perf.span('distance'):
+                    trip_stations = corridor_stations(df, station_index, route, trip_buffer, allowed=allowed)
+                st.session_state.trip_result = (trip_key, trip_stations)
+            with perf.span('render'):
+                if not trip_stations.empty:
+                    st.success(f"Found {len(trip_stations)} charging stations within {trip_buffer}km of your route")
+                    st.dataframe(
+                        pd.DataFrame({
+                            "Station": trip_stations['name'],
+                            "Along route (km)": trip_stations['route_km'].round(1),
+                            "Off route (km)": trip_stations['detour_km'].round(1),
+                            "Type": trip_stations['type'].astype(str),
+                            "Price (Rs./kWh)": trip_stations['price'],
+                            "Status": trip_stations['status'].astype(str),
+                            "Operating Hours": trip_stations['operating_hours'],
+                        }).head(RESULTS_LIMIT),
+                        hide_index=True,
+                    )
+                else:
+                    st.warning(f"No charging stations found within {trip_buffer}km of your route")
+        except Exception as e:
+            st.error(f"Error searching along route: {str(e)}")
+
+# Finish this rerun's timings; the panel is opt-in (debug setting / EV_DEBUG=1)
+rerun_trace = perf.end(get_perf_sink())
+if str(app_setting("debug", "")).lower() in ("1", "true", "yes"):
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption("This rerun")
+        st.dataframe(pd.DataFrame({"ms": rerun_trace.spans}).round(1))
+        st.json(rerun_trace.counters)
+        st.caption("Since server start")
+        totals = perf.totals()
+        st.dataframe(pd.DataFrame(totals["spans"]).T)
+        st.json({"counters": totals["counters"], "station_cache": store.stats(),
+                 "write_queue": get_write_queue().stats(), "rating_queue": get_rating_queue().stats()})
@@ -0,0 +1,53 @@
+"""Vectorized distance helpers for station searches."""
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points.
+
+    Works on whole NumPy/pandas columns at once instead of one geopy call
+    per station.
+    """
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def refine_geodesic(lat, lon, lats, lons, distances, top_k):
+    """Replace the ``top_k`` smallest haversine distances with exact geodesic ones.
+
+    Haversine is off by up to ~0.5%, which only matters for the stations the
+    user actually sees, so the slow geopy call is limited to those.
+    """
+    from geopy.distance import geodesic
+
+    distances = np.array(distances, dtype=np.float64)
+    if top_k <= 0 or len(distances) == 0:
+        return distances
+    k = min(top_k, len(distances))
+    candidates = np.argpartition(distances, k - 1)[:k]
+    lats = np.asarray(lats)
+    lons = np.asarray(lons)
+    for i in candidates:
+        if not np.isfinite(distances[i]):
+            continue
+        distances[i] = geodesic((lat, lon), (lats[i], lons[i])).kilometers
+    return distances
+
+
+def distances_from(df, lat, lon, refine_top_k=0):
+    """Distance in km from ``(lat, lon)`` to every station in ``df``."""
+    # Sheet cells may hold blanks or strings; those become NaN and never match.
+    lats = pd.to_numeric(df['lat'], errors='coerce').to_numpy(dtype=np.float64)
+    lons = pd.to_numeric(df['lon'], errors='coerce').to_numpy(dtype=np.float64)
+    distances = haversine_km(lat, lon, lats, lons)
+    if refine_top_k:
+        distances = refine_geodesic(lat, lon, lats, lons, distances, refine_top_k)
+    return distances
@@ -0,0 +1,174 @@
+"""Memoizing, rate-limited geocoding service.
+
+``tab3`` geocodes the search box on every rerun. ``GeocodingService`` puts a
+normalized-query LRU in front of the backend, persists results to a small
+SQLite file so they survive restarts, throttles backend calls with a token
+bucket (Nominatim allows one request per second) and coalesces identical
+queries that are already in flight.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import perf
+
+GeocodeResult = namedtuple('GeocodeResult', ['latitude', 'longitude', 'address'])
+
+DEFAULT_CACHE_PATH = '.geocode_cache.sqlite3'
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive cache key for a search string."""
+    parts = (' '.join(part.split()) for part in str(query).lower().split(','))
+    return ', '.join(part for part in parts if part)
+
+
+class NominatimBackend:
+    """Backend that forwards to geopy's Nominatim geocoder."""
+
+    def __init__(self, user_agent="ev_charger_finder", timeout=10):
+        from geopy.geocoders import Nominatim
+        self._geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocode(self, query):
+        location = self._geolocator.geocode(query)
+        if location is None:
+            return None
+        return GeocodeResult(location.latitude, location.longitude, location.address)
+
+
+class TokenBucket:
+    """Blocking token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate=1.0, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._sleep((1 - self._tokens) / self.rate)
+
+
+class _SQLiteCache:
+    """Persistent query -> result table. Misses (``None``) are stored too."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                "query TEXT PRIMARY KEY, latitude REAL, longitude REAL, address TEXT, found INTEGER)"
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT latitude, longitude, address, found FROM geocode WHERE query = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, (GeocodeResult(row[0], row[1], row[2]) if row[3] else None)
+
+    def put(self, key, result):
+        values = (key, None, None, None, 0) if result is None else (
+            key, result.latitude, result.longitude, result.address, 1)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)", values)
+
+
+class GeocodingService:
+    """Caches and throttles geocoding lookups made through ``backend``.
+
+    ``backend`` is any object with ``geocode(query)`` returning an object
+    with ``latitude``/``longitude`` (or ``None``), so tests can pass a stub.
+    Set ``cache_path=None`` to keep the cache in memory only.
+    """
+
+    def __init__(self, backend, cache_path=DEFAULT_CACHE_PATH, max_entries=1024, rate_limiter=None):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket()
+        self._disk = _SQLiteCache(cache_path) if cache_path else None
+        self._lru = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+
+    def _remember(self, key, result):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def geocode(self, query):
+        """Coordinates for ``query`` (a ``GeocodeResult``) or ``None`` if not found."""
+        key = normalize_query(query)
+        if not key:
+            return None
+        with self._lock:
+            if key in self._lru:
+                self.hits += 1
+                perf.count('geocode_cache_hit')
+                self._lru.move_to_end(key)
+                return self._lru[key]
+            if self._disk is not None:
+                found, result = self._disk.get(key)
+                if found:
+                    self.hits += 1
+                    perf.count('geocode_cache_hit')
+                    self._remember(key, result)
+                    return result
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+        if not owner:
+            # Someone else is already asking the backend for this query.
+            pending['done'].wait()
+            if pending['error'] is not None:
+                raise pending['error']
+            return pending['result']
+        try:
+            self.rate_limiter.acquire()
+            self.backend_calls += 1
+            perf.count('geocode_backend_calls')
+            location = self.backend.geocode(query)
+            result = None if location is None else GeocodeResult(
+                location.latitude, location.longitude, getattr(location, 'address', None))
+            with self._lock:
+                self._remember(key, result)
+            if self._disk is not None:
+                self._disk.put(key, result)
+            pending['result'] = result
+            return result
+        except Exception as e:
+            # Errors are not cached; the next rerun retries.
+            pending['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            pending['done'].set()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'backend_calls': self.backend_calls}
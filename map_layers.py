@@ -0,0 +1,131 @@
+"""Bulk station layer for the main folium map.
+
+Instead of one ``folium.Marker`` (and one server-side popup string) per
+station, all stations go to the browser as a single JSON array and the
+markers and popups are built client-side by a ``FastMarkerCluster``
+callback. The serialized array is cached per data version, so reruns
+with unchanged data skip the per-row work entirely.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+from folium.template import Template
+
+from station_frame import amenity_labels
+
+# Order of the values in each JSON row; the JS callback below relies on it.
+LAYER_FIELDS = ['lat', 'lon', 'name', 'type', 'price', 'status', 'rating', 'contact', 'amenities']
+
+POPUP_CALLBACK = """
+function (row) {
+    var esc = function (value) {
+        return String(value === null || value === undefined ? '' : value).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    };
+    var html = "<div style='font-family: Arial, sans-serif; padding: 10px;'>"
+        + "<h3 style='color: #4CAF50; margin-bottom: 10px;'>" + esc(row[2]) + "</h3>"
+        + "<p style='margin: 5px 0;'><b>Type:</b> " + esc(row[3]) + "</p>"
+        + "<p style='margin: 5px 0;'><b>Price:</b> Rs. " + esc(row[4]) + "/kWh</p>"
+        + "<p style='margin: 5px 0;'><b>Status:</b> " + esc(row[5]) + "</p>"
+        + "<p style='margin: 5px 0;'><b>Rating:</b> " + '⭐'.repeat(Math.max(0, row[6] | 0)) + "</p>"
+        + "<p style='margin: 5px 0;'><b>Contact:</b> " + esc(row[7]) + "</p>"
+        + "<p style='margin: 5px 0;'><b>Amenities:</b> " + esc(row[8]) + "</p>"
+        + "</div>";
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(html, {maxWidth: 300});
+    marker.bindTooltip(esc(row[2]));
+    return marker;
+}
+"""
+
+_LAYER_CACHE_SIZE = 8
+_layer_cache = OrderedDict()
+_layer_cache_lock = threading.Lock()
+
+
+def data_version(df):
+    """Content hash of the station frame, for callers that have no store snapshot version."""
+    if df.empty:
+        return 'empty'
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(hashes.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+def station_rows(df):
+    """Columnar conversion of the typed station frame into the JSON rows of ``LAYER_FIELDS``."""
+    valid = (df['lat'].notna() & df['lon'].notna()).to_numpy()
+    # float32 -> rounded float64 so the JSON doesn't carry float32 noise digits
+    prices = df['price'].astype('float64').round(2)
+    columns = [
+        df['lat'].astype('float64').round(6).to_numpy()[valid].tolist(),
+        df['lon'].astype('float64').round(6).to_numpy()[valid].tolist(),
+        df['name'].to_numpy()[valid].tolist(),
+        df['type'].astype(str).to_numpy()[valid].tolist(),
+        prices.where(prices.notna(), '').astype(str).to_numpy()[valid].tolist(),
+        df['status'].astype(str).to_numpy()[valid].tolist(),
+        df['rating'].astype(int).to_numpy()[valid].tolist(),
+        df['contact'].to_numpy()[valid].tolist(),
+        amenity_labels(df).to_numpy()[valid].tolist(),
+    ]
+    return [list(row) for row in zip(*columns)]
+
+
+def station_layer_json(df, version=None):
+    """Serialized station rows, cached by data version."""
+    if version is None:
+        version = data_version(df)
+    with _layer_cache_lock:
+        if version in _layer_cache:
+            _layer_cache.move_to_end(version)
+            return _layer_cache[version]
+    # Escape '<' so a station name can't close the surrounding <script> tag.
+    payload = json.dumps(station_rows(df), separators=(',', ':')).replace('<', '\\u003c')
+    with _layer_cache_lock:
+        _layer_cache[version] = payload
+        while len(_layer_cache) > _LAYER_CACHE_SIZE:
+            _layer_cache.popitem(last=False)
+    return payload
+
+
+class StationCluster(FastMarkerCluster):
+    """``FastMarkerCluster`` fed with a pre-serialized JSON payload.
+
+    Use ``StationCluster.from_frame(df)`` to build it from the station frame.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                {{ this.callback }}
+
+                var data = {{ this.data_json }};
+                var cluster = L.markerClusterGroup({{ this.options|tojavascript }});
+
+                for (var i = 0; i < data.length; i++) {
+                    var row = data[i];
+                    var marker = callback(row);
+                    marker.addTo(cluster);
+                }
+
+                cluster.addTo({{ this._parent.get_name() }});
+                return cluster;
+            })();
+        {% endmacro %}"""
+    )
+
+    def __init__(self, data_json, callback=POPUP_CALLBACK, **kwargs):
+        super().__init__([], callback=callback, **kwargs)
+        self._name = 'StationCluster'
+        self.data_json = data_json
+
+    @classmethod
+    def from_frame(cls, df, version=None, **kwargs):
+        return cls(station_layer_json(df, version), **kwargs)
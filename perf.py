@@ -0,0 +1,124 @@
+"""Lightweight timing spans and counters for each script rerun.
+
+``ev_app.py`` brackets every rerun with ``begin()``/``end()`` and each
+stage (connect, ``get_all_records``, building the frame, map build,
+distance, render) with ``span(name)``. Library code bumps counters such as
+cache hits and sheet API calls with ``count(name)``. Everything is recorded twice:
+
+* on the current rerun's ``Trace`` (thread-local, since Streamlit runs each
+  session's script in its own thread), which the debug panel shows and the
+  JSON-lines sink writes out, one line per rerun;
+* in process-wide totals (``totals()``), which also include work done on
+  background threads such as the write queue.
+
+A span costs two ``perf_counter`` calls and a few dict updates, so it stays
+on in production.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+_lock = threading.Lock()
+_span_totals = {}  # name -> [count, total_ms, max_ms]
+_counter_totals = {}
+
+
+class Trace:
+    """Spans (ms) and counters recorded during one rerun."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.spans = {}
+        self.counters = {}
+
+    def as_dict(self):
+        return {
+            'ts': round(self.started, 3),
+            'run': self.name,
+            'spans_ms': {name: round(ms, 2) for name, ms in self.spans.items()},
+            'counters': dict(self.counters),
+        }
+
+
+class JsonlSink:
+    """Appends one JSON object per finished rerun to ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':'))
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def current():
+    """The trace of the rerun running on this thread, or ``None``."""
+    return getattr(_local, 'trace', None)
+
+
+def begin(name='rerun'):
+    """Start the trace for a rerun on this thread (replacing any unfinished one)."""
+    _local.trace = Trace(name)
+    _local.started = time.perf_counter()
+    return _local.trace
+
+
+def end(sink=None):
+    """Finish this thread's trace: record the whole run as span ``name`` and write it to ``sink``."""
+    trace = current()
+    if trace is None:
+        return None
+    _record(trace.name, (time.perf_counter() - _local.started) * 1000)
+    _local.trace = None
+    if sink is not None:
+        sink.write(trace.as_dict())
+    return trace
+
+
+def _record(name, elapsed):
+    trace = current()
+    if trace is not None:
+        trace.spans[name] = trace.spans.get(name, 0.0) + elapsed
+    with _lock:
+        totals = _span_totals.setdefault(name, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += elapsed
+        totals[2] = max(totals[2], elapsed)
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block (repeated spans in one rerun add up)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, (time.perf_counter() - start) * 1000)
+
+
+def count(name, n=1):
+    """Add ``n`` to counter ``name``."""
+    trace = current()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + n
+    with _lock:
+        _counter_totals[name] = _counter_totals.get(name, 0) + n
+
+
+def totals():
+    """Process-wide span statistics and counters since start (or ``reset``)."""
+    with _lock:
+        spans = {name: {'count': c, 'total_ms': round(total, 2), 'mean_ms': round(total / c, 2), 'max_ms': round(peak, 2)}
+                 for name, (c, total, peak) in _span_totals.items()}
+        return {'spans': spans, 'counters': dict(_counter_totals)}
+
+
+def reset():
+    with _lock:
+        _span_totals.clear()
+        _counter_totals.clear()
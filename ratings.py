@@ -0,0 +1,94 @@
+"""Running rating aggregates per station.
+
+Each submitted rating is kept as an event (appended to the ``ratings``
+worksheet) and folded into a per-station count/sum, so the mean shown next
+to a station is an O(1) lookup. The aggregate is written back to the
+station's ``rating``/``reviews`` cells through the write queue, which
+coalesces a burst of ratings for one station into a single update.
+
+Events identify the station by ``station_id`` (see ``station_frame.station_key``),
+which stays valid when the station sheet is rewritten; ``sheet_row`` is only
+the row the station had when it was rated.
+"""
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from station_frame import station_key, station_keys
+
+# station_id comes last so existing ratings worksheets keep their column layout.
+RATING_EVENT_COLUMNS = ['timestamp', 'sheet_row', 'name', 'lat', 'lon', 'rating', 'station_id']
+
+
+class RatingIndex:
+    """Count and sum of ratings keyed by ``station_key``."""
+
+    def __init__(self):
+        self._counts = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, stations=None):
+        """Seed from the sheet's ``rating`` (mean) and ``reviews`` (count) columns.
+
+        Keys are taken from ``stations`` (the normalized frame of the same
+        rows) when given, so they match the keys ``ev_app.py`` looks up.
+        """
+        index = cls()
+        if df.empty or 'rating' not in df or 'reviews' not in df:
+            return index
+        counts = pd.to_numeric(df['reviews'], errors='coerce').fillna(0).astype(int)
+        means = pd.to_numeric(df['rating'], errors='coerce').fillna(0)
+        rated = (counts > 0).to_numpy()
+        keys = station_keys((df if stations is None else stations)[rated])
+        for key, count, mean in zip(keys, counts[rated], means[rated]):
+            index._counts[key] = int(count)
+            index._totals[key] = float(mean) * int(count)
+        return index
+
+    def carry_over(self, previous):
+        """Keep aggregates of ``previous`` that are ahead of this one.
+
+        A reload can come before queued ``rating``/``reviews`` cell updates
+        are written (or before a new station's row is), so the sheet's count
+        lags the running one. Returns the keys whose cells need rewriting.
+        """
+        ahead = []
+        with previous._lock:
+            for key, count in previous._counts.items():
+                if count > self._counts.get(key, 0):
+                    self._counts[key] = count
+                    self._totals[key] = previous._totals[key]
+                    ahead.append(key)
+        return ahead
+
+    def add(self, key, value):
+        """Fold one rating in and return the station's new ``(count, mean)``."""
+        with self._lock:
+            count = self._counts.get(key, 0) + 1
+            total = self._totals.get(key, 0.0) + float(value)
+            self._counts[key] = count
+            self._totals[key] = total
+        return count, total / count
+
+    def get(self, key):
+        """``(count, mean)`` for a station; ``(0, 0.0)`` when it has no ratings."""
+        count = self._counts.get(key, 0)
+        if not count:
+            return 0, 0.0
+        return count, self._totals[key] / count
+
+
+def rating_event(sheet_row, row, value):
+    """Event row for the ``ratings`` worksheet, in ``RATING_EVENT_COLUMNS`` order."""
+    return [
+        datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        sheet_row if sheet_row is not None else '',
+        row.get('name', ''),
+        round(float(row.get('lat', 'nan')), 6),
+        round(float(row.get('lon', 'nan')), 6),
+        int(value),
+        station_key(row),
+    ]
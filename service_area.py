@@ -0,0 +1,156 @@
+"""Point-in-polygon checks against the areas the app serves.
+
+Service areas are (Multi)Polygon features in a local GeoJSON file, one per
+city, named by their ``name`` property. ``ServiceAreaIndex`` buckets each
+area's edges into a lat/lon grid once at load, covering only that area's
+own bounding box (so two distant cities don't pay for the country between
+them):
+
+* cells that no edge passes through are wholly inside or wholly outside the
+  area; the inside ones are kept in a set, found with one scanline per row;
+* cells on a boundary keep only the edges of their latitude row, and a
+  ray cast tests just those.
+
+A query is therefore a dict lookup for most points and a short ray cast near
+coastlines. Adding a city means adding a feature to the file.
+"""
+import bisect
+import json
+import math
+import os
+
+SERVICE_AREAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service_areas.geojson')
+DEFAULT_CELL_DEG = 0.01  # ~1.1 km
+
+
+def _polygons(geometry):
+    if geometry.get('type') == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry.get('type') == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+class ServiceAreaIndex:
+    """Grid-bucketed point-in-polygon index over named service areas."""
+
+    def __init__(self, areas, cell_deg=DEFAULT_CELL_DEG):
+        """``areas`` is a list of ``(name, rings)``; rings are ``[(lon, lat), ...]``, holes included."""
+        self.cell_deg = cell_deg
+        self.names = [name for name, _ in areas]
+        # Per area: edges (lat1, lon1, lat2, lon2) bucketed by latitude row,
+        # (min_row, max_row, min_col, max_col), boundary cells and interior cells.
+        self._rows = []
+        self._bounds = []
+        self._boundary = []
+        self._inside = []
+        for _, rings in areas:
+            rows = {}
+            boundary = set()
+            for ring in rings:
+                for (lon1, lat1), (lon2, lat2) in zip(ring, ring[1:] + ring[:1]):
+                    edge = (lat1, lon1, lat2, lon2)
+                    for row in range(self._row(min(lat1, lat2)), self._row(max(lat1, lat2)) + 1):
+                        rows.setdefault(row, []).append(edge)
+                    boundary.update(self._edge_cells(lat1, lon1, lat2, lon2))
+            self._rows.append(rows)
+            self._boundary.append(boundary)
+            if not boundary:
+                self._bounds.append(None)
+                self._inside.append(set())
+                continue
+            bounds = (min(r for r, _ in boundary), max(r for r, _ in boundary),
+                      min(c for _, c in boundary), max(c for _, c in boundary))
+            self._bounds.append(bounds)
+            self._inside.append(self._interior_cells(rows, boundary, bounds))
+
+    def _interior_cells(self, rows, boundary, bounds):
+        """Non-boundary cells whose center is inside, one scanline per row."""
+        min_row, max_row, min_col, max_col = bounds
+        inside = set()
+        for row in range(min_row, max_row + 1):
+            lat = (row + 0.5) * self.cell_deg
+            crossings = sorted(
+                lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+                for lat1, lon1, lat2, lon2 in rows.get(row, ())
+                if (lat1 > lat) != (lat2 > lat)
+            )
+            for col in range(min_col, max_col + 1):
+                if (row, col) in boundary:
+                    continue
+                lon = (col + 0.5) * self.cell_deg
+                if (len(crossings) - bisect.bisect_right(crossings, lon)) % 2:
+                    inside.add((row, col))
+        return inside
+
+    @classmethod
+    def from_geojson(cls, data, cell_deg=DEFAULT_CELL_DEG):
+        """Index the (Multi)Polygon features of a GeoJSON FeatureCollection."""
+        areas = []
+        for number, feature in enumerate(data.get('features', [])):
+            name = (feature.get('properties') or {}).get('name') or f"area {number + 1}"
+            for polygon in _polygons(feature.get('geometry') or {}):
+                rings = []
+                for ring in polygon:
+                    points = [(float(lon), float(lat)) for lon, lat, *_ in ring]
+                    if len(points) > 1 and points[0] == points[-1]:
+                        points.pop()
+                    rings.append(points)
+                areas.append((name, rings))
+        return cls(areas, cell_deg)
+
+    @classmethod
+    def from_file(cls, path=SERVICE_AREAS_PATH, cell_deg=DEFAULT_CELL_DEG):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_geojson(json.load(f), cell_deg)
+
+    def _row(self, lat):
+        return math.floor(lat / self.cell_deg)
+
+    def _col(self, lon):
+        return math.floor(lon / self.cell_deg)
+
+    def _edge_cells(self, lat1, lon1, lat2, lon2):
+        """Cells an edge passes through (conservatively: its bounding box, split into short steps)."""
+        steps = max(1, int(max(abs(lat2 - lat1), abs(lon2 - lon1)) / self.cell_deg) + 1)
+        cells = set()
+        for step in range(steps):
+            t0, t1 = step / steps, (step + 1) / steps
+            la0, la1 = lat1 + (lat2 - lat1) * t0, lat1 + (lat2 - lat1) * t1
+            lo0, lo1 = lon1 + (lon2 - lon1) * t0, lon1 + (lon2 - lon1) * t1
+            for row in range(self._row(min(la0, la1)), self._row(max(la0, la1)) + 1):
+                for col in range(self._col(min(lo0, lo1)), self._col(max(lo0, lo1)) + 1):
+                    cells.add((row, col))
+        return cells
+
+    def _ray_cast(self, area, lat, lon):
+        """Whether the point is inside ``area`` (even-odd rule)."""
+        crossings = 0
+        for lat1, lon1, lat2, lon2 in self._rows[area].get(self._row(lat), ()):
+            if (lat1 > lat) != (lat2 > lat):
+                cross_lon = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+                if lon < cross_lon:
+                    crossings += 1
+        return crossings % 2 == 1
+
+    def area_at(self, lat, lon):
+        """Name of the (first) service area containing the point, or ``None``."""
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return None
+        if math.isnan(lat) or math.isnan(lon):
+            return None
+        row, col = self._row(lat), self._col(lon)
+        for area, bounds in enumerate(self._bounds):
+            if bounds is None or not (bounds[0] <= row <= bounds[1] and bounds[2] <= col <= bounds[3]):
+                continue
+            if (row, col) in self._boundary[area]:
+                if self._ray_cast(area, lat, lon):
+                    return self.names[area]
+            elif (row, col) in self._inside[area]:
+                return self.names[area]
+        return None
+
+    def contains(self, lat, lon):
+        return self.area_at(lat, lon) is not None
@@ -0,0 +1,202 @@
+"""Grid-bucketed spatial index over station coordinates.
+
+Stations are hashed into fixed-size lat/lon cells (a flat geohash), so a
+radius or k-nearest query only computes distances for stations in the cells
+around the query point instead of scanning the whole table.
+"""
+import math
+import threading
+
+import numpy as np
+
+from geo_utils import haversine_km, refine_geodesic
+
+KM_PER_DEG_LAT = 111.32
+DEFAULT_CELL_DEG = 0.05  # ~5.5 km at Karachi's latitude
+
+
+class GridIndex:
+    """Maps station ids to grid cells and answers radius / k-nearest queries.
+
+    Ids are whatever the caller uses to find the row again; ``ev_app.py``
+    uses positional row numbers in the station DataFrame. ``add`` and the
+    queries take a lock, so an index can be read while another thread adds
+    to it; ``with_station`` leaves the original untouched instead.
+    """
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._ids = []
+        self._lats = []
+        self._lons = []
+        self._arrays = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_coordinates(cls, lats, lons, ids=None, cell_deg=DEFAULT_CELL_DEG):
+        index = cls(cell_deg)
+        if ids is None:
+            ids = range(len(lats))
+        for key, lat, lon in zip(ids, lats, lons):
+            index.add(key, lat, lon)
+        return index
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    @staticmethod
+    def _coordinates(lat, lon):
+        """``(lat, lon)`` as floats, or ``None`` when either is missing."""
+        try:
+            lat = float(lat)
+            lon = float(lon)
+        except (TypeError, ValueError):
+            return None
+        if math.isnan(lat) or math.isnan(lon):
+            return None
+        return lat, lon
+
+    def add(self, key, lat, lon):
+        """Insert one station; rows with missing coordinates are skipped."""
+        point = self._coordinates(lat, lon)
+        if point is None:
+            return
+        with self._lock:
+            self._cells.setdefault(self._cell(*point), []).append(len(self._ids))
+            self._ids.append(key)
+            self._lats.append(point[0])
+            self._lons.append(point[1])
+            self._arrays = None
+
+    def with_station(self, key, lat, lon):
+        """A new index holding one more station; this one is not modified.
+
+        Only the cell that gains the station is copied, so indexes already
+        handed to readers keep answering for the frame they were built with.
+        """
+        clone = GridIndex(self.cell_deg)
+        with self._lock:
+            clone._cells = dict(self._cells)
+            clone._ids = list(self._ids)
+            clone._lats = list(self._lats)
+            clone._lons = list(self._lons)
+        point = self._coordinates(lat, lon)
+        if point is not None:
+            cell = clone._cell(*point)
+            clone._cells[cell] = list(clone._cells.get(cell, ()))
+        clone.add(key, lat, lon)
+        return clone
+
+    def _as_arrays(self):
+        with self._lock:
+            if self._arrays is None:
+                self._arrays = (np.array(self._ids), np.array(self._lats), np.array(self._lons))
+            return self._arrays
+
+    def _candidates(self, lat, lon, radius_km):
+        """Internal slots of every station in cells overlapping the radius' bounding box."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        return self._box_slots(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+
+    def _box_slots(self, south, west, north, east):
+        """Internal slots of every station in cells overlapping a lat/lon box."""
+        i0, j0 = self._cell(south, west)
+        i1, j1 = self._cell(north, east)
+        slots = []
+        with self._lock:
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+                # Query box is larger than the occupied area: walk the occupied cells.
+                for (i, j), members in self._cells.items():
+                    if i0 <= i <= i1 and j0 <= j <= j1:
+                        slots.extend(members)
+            else:
+                for i in range(i0, i1 + 1):
+                    for j in range(j0, j1 + 1):
+                        slots.extend(self._cells.get((i, j), ()))
+        return np.array(slots, dtype=np.int64)
+
+    def _within_unsorted(self, lat, lon, radius_km, allowed):
+        ids, lats, lons = self._as_arrays()
+        slots = self._candidates(lat, lon, radius_km)
+        slots = slots[slots < len(ids)]  # stations added since the arrays were taken
+        if allowed is not None and len(slots):
+            slots = slots[np.asarray(allowed, dtype=bool)[ids[slots]]]
+        if len(slots) == 0:
+            return slots, np.empty(0)
+        distances = haversine_km(lat, lon, lats[slots], lons[slots])
+        keep = distances <= radius_km
+        return slots[keep], distances[keep]
+
+    def within(self, lat, lon, radius_km, allowed=None):
+        """Ids and distances (km) of stations within ``radius_km``, nearest first.
+
+        ``allowed`` is an optional boolean mask indexed by id (positional ids
+        only); stations outside it are dropped before any distance is computed.
+        """
+        slots, distances = self._within_unsorted(lat, lon, radius_km, allowed)
+        order = np.argsort(distances, kind='stable')
+        return self._as_arrays()[0][slots[order]], distances[order]
+
+    def within_top(self, lat, lon, radius_km, limit, allowed=None):
+        """Like ``within`` but only the ``limit`` nearest, plus the total match count.
+
+        Uses a partial sort (``argpartition``), so a wide radius doesn't pay
+        for ordering stations that will never be shown.
+        """
+        slots, distances = self._within_unsorted(lat, lon, radius_km, allowed)
+        total = len(slots)
+        if total > limit:
+            top = np.argpartition(distances, limit - 1)[:limit]
+            slots, distances = slots[top], distances[top]
+        order = np.argsort(distances, kind='stable')
+        return self._as_arrays()[0][slots[order]], distances[order], total
+
+    def in_bbox(self, south, west, north, east):
+        """Ids of stations inside a lat/lon bounding box (e.g. the map viewport)."""
+        ids, lats, lons = self._as_arrays()
+        slots = self._box_slots(south, west, north, east)
+        slots = slots[slots < len(ids)]
+        if len(slots) == 0:
+            return ids[:0]
+        keep = ((lats[slots] >= south) & (lats[slots] <= north)
+                & (lons[slots] >= west) & (lons[slots] <= east))
+        return ids[np.sort(slots[keep])]
+
+    def nearest(self, lat, lon, k, max_km=None):
+        """Ids and distances (km) of the ``k`` nearest stations, nearest first."""
+        if k <= 0 or not self._ids:
+            return self._as_arrays()[0][:0], np.empty(0)
+        # Grow the search radius until it holds k stations; everything closer
+        # than that radius has then been seen, so the k smallest are exact.
+        radius = self.cell_deg * KM_PER_DEG_LAT
+        while True:
+            limit = radius if max_km is None else min(radius, max_km)
+            ids, distances = self.within(lat, lon, limit)
+            if len(ids) >= k or limit == max_km or len(ids) == len(self._ids):
+                return ids[:k], distances[:k]
+            radius *= 2
+
+
+def _with_distances(df, lat, lon, positions, distances, max_km, refine_top_k):
+    nearby = df.iloc[np.asarray(positions, dtype=np.int64)].copy()
+    if refine_top_k:
+        distances = refine_geodesic(lat, lon, nearby['lat'].astype(float), nearby['lon'].astype(float),
+                                    distances, refine_top_k)
+    nearby['distance'] = distances
+    return nearby[nearby['distance'] <= max_km].sort_values('distance', kind='stable')
+
+
+def nearest_stations(df, index, lat, lon, max_km, limit, refine_top_k=0, allowed=None):
+    """The ``limit`` nearest rows of ``df`` within ``max_km`` of a point, and the total match count.
+
+    Rows get a ``distance`` column and come nearest first. ``index`` must be
+    keyed by positional row number in ``df``; ``allowed`` is an optional
+    filter mask over those positions.
+    """
+    positions, distances, total = index.within_top(lat, lon, max_km, limit, allowed=allowed)
+    return _with_distances(df, lat, lon, positions, distances, max_km, refine_top_k), total
@@ -0,0 +1,120 @@
+"""One-time normalization of loaded station records into a compact, typed frame.
+
+``get_all_records()`` returns loosely typed cells (numbers, blank strings,
+JSON-encoded amenity lists). ``normalize_stations`` parses them once at load
+so filtering and rendering work on clean vectors:
+
+* ``lat``/``lon``/``price`` as float32 (unparseable cells become NaN)
+* ``type``/``status`` as categoricals
+* ``rating`` as int8 stars (0-5) and ``reviews`` as int32
+* one boolean ``amenity_<name>`` column per entry of ``AMENITIES``
+
+Rows also carry a ``station_id`` that, unlike the sheet row number, survives
+rewrites of the sheet (see ``station_key``).
+"""
+import json
+import uuid
+
+import numpy as np
+import pandas as pd
+
+AMENITIES = ["Restrooms", "Food", "Shopping", "WiFi", "Covered", "24/7"]
+CATEGORY_COLUMNS = ['type', 'status']
+TEXT_COLUMNS = ['name', 'contact', 'operating_hours', 'verified_email', 'station_id']
+
+
+def amenity_column(name):
+    """Boolean column holding one amenity (``'24/7'`` -> ``'amenity_24_7'``)."""
+    slug = ''.join(c if c.isalnum() else '_' for c in name.lower())
+    return f"amenity_{slug}"
+
+
+AMENITY_COLUMNS = [amenity_column(name) for name in AMENITIES]
+
+
+def parse_amenities(value):
+    """Amenity names from a JSON-encoded list (or a list); ``[]`` if unparseable."""
+    if isinstance(value, (list, tuple)):
+        return value
+    try:
+        parsed = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def to_number(value, default=0.0):
+    """``value`` as a float, or ``default`` when it is blank or not a number."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if np.isnan(number) else number
+
+
+def _numeric(df, column, default=np.nan):
+    if column not in df:
+        return pd.Series(default, index=df.index, dtype='float64')
+    return pd.to_numeric(df[column], errors='coerce')
+
+
+def normalize_stations(raw):
+    """Typed station frame built from raw sheet records (see module docstring)."""
+    df = pd.DataFrame(index=raw.index)
+    for column in TEXT_COLUMNS:
+        df[column] = raw[column].fillna('').astype(str) if column in raw else ''
+    df['lat'] = _numeric(raw, 'lat').astype(np.float32)
+    df['lon'] = _numeric(raw, 'lon').astype(np.float32)
+    df['price'] = _numeric(raw, 'price').astype(np.float32)
+    for column in CATEGORY_COLUMNS:
+        values = raw[column].fillna('').astype(str) if column in raw else pd.Series('', index=raw.index)
+        df[column] = values.astype('category')
+    df['rating'] = _numeric(raw, 'rating', 0).fillna(0).clip(0, 5).round().astype(np.int8)
+    df['reviews'] = _numeric(raw, 'reviews', 0).fillna(0).clip(lower=0).astype(np.int32)
+    parsed = raw['amenities'].map(parse_amenities) if 'amenities' in raw else pd.Series([[]] * len(raw), index=raw.index)
+    for name, column in zip(AMENITIES, AMENITY_COLUMNS):
+        df[column] = parsed.map(lambda items, name=name: name in items).astype(bool)
+    return df
+
+
+def concat_stations(df, extra):
+    """Append normalized rows, keeping categorical columns categorical."""
+    combined = pd.concat([df, extra], ignore_index=True)
+    for column in CATEGORY_COLUMNS:
+        if column in combined:
+            combined[column] = combined[column].astype(str).astype('category')
+    return combined
+
+
+def new_station_id():
+    return uuid.uuid4().hex[:12]
+
+
+def station_key(row):
+    """Stable id of a station row: its ``station_id``, or one derived from name and
+    coordinates for rows written before ids existed."""
+    station_id = str(row.get('station_id') or '').strip()
+    if station_id:
+        return station_id
+    return f"{str(row.get('name', '')).strip()}@{float(row.get('lat', 'nan')):.5f},{float(row.get('lon', 'nan')):.5f}"
+
+
+def station_keys(df):
+    """``station_key`` of every row of ``df``, as a list."""
+    columns = [column for column in ('station_id', 'name', 'lat', 'lon') if column in df]
+    return [station_key(row) for row in df[columns].to_dict('records')]
+
+
+def amenity_labels(df):
+    """Comma-separated amenity names per row, built from the boolean columns."""
+    labels = np.full(len(df), '', dtype=object)
+    for name, column in zip(AMENITIES, AMENITY_COLUMNS):
+        if column in df:
+            has = df[column].to_numpy(dtype=bool)
+            labels[has] = labels[has] + (name + ', ')
+    return pd.Series(labels, index=df.index).str.rstrip(', ')
+
+
+def amenity_text(row):
+    """Amenity names of a single station row."""
+    return ', '.join(name for name, column in zip(AMENITIES, AMENITY_COLUMNS) if row.get(column, False))
@@ -0,0 +1,130 @@
+"""Indexed multi-criteria filters over the typed station frame.
+
+``StationQueryEngine`` precomputes, once per loaded frame:
+
+* a boolean bitmap per charger type, status and amenity,
+* a price-sorted permutation for range lookups with ``searchsorted``,
+* opening intervals parsed from ``operating_hours``.
+
+``match`` intersects the relevant bitmaps and returns a mask over row
+positions, which the spatial index applies before computing any distance.
+"""
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from station_frame import AMENITIES, AMENITY_COLUMNS
+
+APP_TIMEZONE = ZoneInfo('Asia/Karachi')
+MINUTES_PER_DAY = 24 * 60
+
+_HOURS_RANGE = re.compile(
+    r'(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\s*(?:-|–|to)\s*(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?',
+    re.IGNORECASE,
+)
+_ALWAYS_OPEN = re.compile(r'24\s*/\s*7|24\s*hours|open\s*24', re.IGNORECASE)
+
+
+def _to_minutes(hour, minute, meridiem):
+    hour = int(hour) % 24
+    minute = int(minute or 0)
+    if meridiem:
+        meridiem = meridiem.lower()
+        if meridiem == 'pm' and hour < 12:
+            hour += 12
+        elif meridiem == 'am' and hour == 12:
+            hour = 0
+    return hour * 60 + minute
+
+
+def parse_operating_hours(text):
+    """``(open_minute, close_minute)`` of a day, ``(0, 1440)`` for 24/7, or ``None`` if unparseable.
+
+    ``close < open`` means the station closes after midnight. Without am/pm on
+    either end, a closing hour before the opening one is read as PM when that
+    lands after opening ("9-5" is 09:00-17:00, "22-6" stays overnight).
+    """
+    text = str(text or '').strip()
+    if not text:
+        return None
+    if _ALWAYS_OPEN.search(text):
+        return 0, MINUTES_PER_DAY
+    match = _HOURS_RANGE.search(text)
+    if match is None:
+        return None
+    start_h, start_m, start_mer, end_h, end_m, end_mer = match.groups()
+    opens = _to_minutes(start_h, start_m, start_mer)
+    closes = _to_minutes(end_h, end_m, end_mer)
+    if not start_mer and not end_mer and closes < opens and int(end_h) < 12 and closes + 12 * 60 > opens:
+        closes += 12 * 60
+    if opens == closes:
+        return 0, MINUTES_PER_DAY
+    return opens, closes
+
+
+class StationQueryEngine:
+    """Per-column indexes over one typed station frame (see ``station_frame``)."""
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.types = self._category_bitmaps(df['type'])
+        self.statuses = self._category_bitmaps(df['status'])
+        self.amenities = {name: df[column].to_numpy(dtype=bool)
+                          for name, column in zip(AMENITIES, AMENITY_COLUMNS)}
+        prices = df['price'].to_numpy(dtype=np.float64)
+        known = ~np.isnan(prices)
+        self._price_order = np.flatnonzero(known)[np.argsort(prices[known], kind='stable')]
+        self._sorted_prices = prices[self._price_order]
+        intervals = [parse_operating_hours(text) for text in df['operating_hours']]
+        self._has_hours = np.array([interval is not None for interval in intervals], dtype=bool)
+        self._opens = np.array([interval[0] if interval else 0 for interval in intervals], dtype=np.int16)
+        self._closes = np.array([interval[1] if interval else 0 for interval in intervals], dtype=np.int16)
+
+    @staticmethod
+    def _category_bitmaps(column):
+        codes = column.cat.codes.to_numpy()
+        return {str(value): codes == code for code, value in enumerate(column.cat.categories)}
+
+    def _any_of(self, bitmaps, values):
+        mask = np.zeros(self.size, dtype=bool)
+        for value in values:
+            if value in bitmaps:
+                mask |= bitmaps[value]
+        return mask
+
+    def price_between(self, low=None, high=None):
+        """Bitmap of stations priced within ``[low, high]`` via the sorted price index."""
+        start = 0 if low is None else np.searchsorted(self._sorted_prices, low, side='left')
+        stop = len(self._sorted_prices) if high is None else np.searchsorted(self._sorted_prices, high, side='right')
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self._price_order[start:stop]] = True
+        return mask
+
+    def open_at(self, when):
+        """Bitmap of stations whose parsed hours include ``when`` (stations without hours are excluded)."""
+        minute = when.hour * 60 + when.minute
+        same_day = (self._opens <= minute) & (minute < self._closes)
+        overnight = (self._closes < self._opens) & ((minute >= self._opens) | (minute < self._closes))
+        always = self.amenities.get('24/7', np.zeros(self.size, dtype=bool))
+        return (self._has_hours & (same_day | overnight)) | always
+
+    def match(self, types=(), statuses=(), amenities=(), min_price=None, max_price=None, open_now=False, now=None):
+        """Boolean mask over row positions matching every given criterion.
+
+        Empty/``None`` criteria are ignored; values within ``types`` or
+        ``statuses`` are OR-ed, everything else is AND-ed.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        if types:
+            mask &= self._any_of(self.types, types)
+        if statuses:
+            mask &= self._any_of(self.statuses, statuses)
+        for name in amenities:
+            mask &= self.amenities.get(name, np.zeros(self.size, dtype=bool))
+        if min_price is not None or max_price is not None:
+            mask &= self.price_between(min_price, max_price)
+        if open_now:
+            mask &= self.open_at(now or datetime.now(APP_TIMEZONE))
+        return mask
@@ -0,0 +1,205 @@
+"""Cached access to the charging station worksheet.
+
+The Streamlit script reruns top to bottom on every interaction, so the
+station sheet must not be fetched each time. ``StationStore`` keeps the
+loaded DataFrame for a configurable TTL and is shared across sessions
+(see ``get_station_store`` in ``ev_app.py``).
+
+``load`` hands out a ``StationSnapshot``: the frame together with the
+spatial index, filter indexes and rating aggregates built for it. Local
+adds and updates publish a new snapshot instead of changing the current
+one, so a rerun keeps using positions that match the frame it loaded even
+while another session adds a station. Every snapshot carries a ``version``
+number, unique within the process, that the map uses as its payload cache
+key instead of hashing the frame.
+
+Rating aggregates are keyed by ``station_key`` and survive reloads: when
+the sheet is behind (a queued cell update, or a station rated before its
+row was written), the running aggregate is kept and the cell update is
+handed out by ``take_rating_updates`` once the row has a sheet position.
+"""
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+import perf
+from ratings import RatingIndex
+from spatial_index import GridIndex
+from station_frame import concat_stations, normalize_stations, station_key, station_keys
+from station_query import StationQueryEngine
+
+# Column order of the ``ev_chargers`` worksheet, as written by the add form.
+STATION_COLUMNS = [
+    'name', 'lat', 'lon', 'price', 'type', 'contact', 'status',
+    'rating', 'reviews', 'amenities', 'operating_hours', 'verified_email', 'station_id',
+]
+
+DEFAULT_TTL = 300  # seconds
+
+StationSnapshot = namedtuple('StationSnapshot', ['df', 'index', 'query', 'ratings', 'version'])
+
+# Shared by all stores, so a rebuilt store never reuses a version a cache still holds.
+_versions = itertools.count(1)
+
+
+class StationStore:
+    """Loads station records from a worksheet and caches them for ``ttl`` seconds.
+
+    ``sheet`` is anything with gspread's ``get_all_records()``, so a small
+    in-memory fake works in tests. Writes go through ``write_queue``; the
+    ``*_local_row`` methods only update the cached snapshot.
+    """
+
+    def __init__(self, sheet, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.sheet = sheet
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._ratings = None
+        self._stale_ratings = set()
+        self._rating_updates = []
+        self._loaded_rows = 0
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+
+    def _is_fresh(self):
+        return self._snapshot is not None and self._clock() - self._loaded_at < self.ttl
+
+    def _publish(self, df, index=None):
+        """Make ``df`` (and its indexes) the current snapshot."""
+        if index is None:
+            index = GridIndex.from_coordinates(df['lat'], df['lon'])
+        self._snapshot = StationSnapshot(df, index, StationQueryEngine(df), self._ratings, next(_versions))
+
+    def load(self, force=False):
+        """Return the current ``StationSnapshot``, fetching from the sheet only when stale."""
+        with self._lock:
+            if not force and self._is_fresh():
+                self.hits += 1
+                perf.count('station_cache_hit')
+            else:
+                self.misses += 1
+                perf.count('station_cache_miss')
+                perf.count('sheet_calls')
+                with perf.span('get_all_records'):
+                    records = self.sheet.get_all_records()
+                with perf.span('build_df'):
+                    raw = pd.DataFrame(records)
+                    df = normalize_stations(raw)
+                    # Ratings are seeded from the raw mean before it is rounded to stars.
+                    ratings = RatingIndex.from_frame(raw, df)
+                    if self._ratings is not None:
+                        self._stale_ratings.update(ratings.carry_over(self._ratings))
+                    self._ratings = ratings
+                    if self._stale_ratings:
+                        self._apply_stale_ratings(df)
+                    self._publish(df)
+                self._loaded_rows = len(self._snapshot.df)
+                self._loaded_at = self._clock()
+            # Shallow copy so callers can add columns without touching the cache.
+            return self._snapshot._replace(df=self._snapshot.df.copy(deep=False))
+
+    def _apply_stale_ratings(self, df):
+        """Show aggregates the sheet is behind on and collect their cell updates."""
+        keys = station_keys(df)
+        for position, key in enumerate(keys):
+            if key not in self._stale_ratings:
+                continue
+            count, mean = self._ratings.get(key)
+            df.iat[position, df.columns.get_loc('rating')] = round(mean)
+            df.iat[position, df.columns.get_loc('reviews')] = count
+            self._rating_updates.append((position + 2, {'rating': round(mean, 1), 'reviews': count}))
+            self._stale_ratings.discard(key)
+
+    def take_rating_updates(self):
+        """``(sheet_row, cells)`` updates for aggregates the sheet is behind on; each is returned once."""
+        with self._lock:
+            updates, self._rating_updates = self._rating_updates, []
+            return updates
+
+    def invalidate(self):
+        """Drop the cached snapshot so the next ``load`` refetches (rating aggregates are kept)."""
+        with self._lock:
+            self._snapshot = None
+            self._loaded_rows = 0
+            self._loaded_at = None
+
+    def ratings(self):
+        """Running rating aggregates, keyed by ``station_key`` (shared by all snapshots)."""
+        with self._lock:
+            if self._ratings is None:
+                self._ratings = RatingIndex()
+            return self._ratings
+
+    def sheet_row(self, position):
+        """1-based worksheet row of a cached row, or ``None`` if it isn't in the sheet yet."""
+        if 0 <= position < self._loaded_rows:
+            return position + 2  # header is row 1
+        return None
+
+    def record_rating(self, position, row, value):
+        """Fold a rating for ``row`` into the aggregates and the cached frame; returns ``(count, mean)``.
+
+        A station without a sheet row yet gets its cells written after the
+        reload that finds the row (see ``take_rating_updates``).
+        """
+        key = station_key(row)
+        count, mean = self.ratings().add(key, value)
+        with self._lock:
+            df = None if self._snapshot is None else self._snapshot.df
+            # A reload since the caller's snapshot may have moved the station.
+            if df is not None and position < len(df) and station_key(df.iloc[position]) == key:
+                df.iat[position, df.columns.get_loc('rating')] = round(mean)
+                df.iat[position, df.columns.get_loc('reviews')] = count
+                self._snapshot = self._snapshot._replace(version=next(_versions))
+        return count, mean
+
+    def add_local_row(self, values):
+        """Add a station row to the cached frame and index only.
+
+        Used for optimistic updates while the sheet write is still queued;
+        rows written by other sessions still arrive when the TTL expires.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                return
+            current = self._snapshot
+            row = normalize_stations(pd.DataFrame([dict(zip(STATION_COLUMNS, values))]))
+            position = len(current.df)
+            self._publish(concat_stations(current.df, row),
+                          current.index.with_station(position, row.at[0, 'lat'], row.at[0, 'lon']))
+
+    def update_local_row(self, position, values):
+        """Overwrite fields of a cached row (``values`` maps column name to raw value).
+
+        The optimistic counterpart of a queued ``batch_update``, e.g. when a
+        duplicate submission is merged into an existing station.
+        """
+        with self._lock:
+            if self._snapshot is None or position >= len(self._snapshot.df):
+                return
+            df = self._snapshot.df.copy()
+            row = normalize_stations(pd.DataFrame([values]))
+            for column in row.columns:
+                if column not in values and not (column.startswith('amenity_') and 'amenities' in values):
+                    continue
+                value = row.at[0, column]
+                if isinstance(df[column].dtype, pd.CategoricalDtype) and value not in df[column].cat.categories:
+                    df[column] = df[column].cat.add_categories([value])
+                df.iat[position, df.columns.get_loc(column)] = value
+            # Coordinates are unchanged, so the spatial index carries over.
+            self._publish(df, self._snapshot.index)
+
+    def stats(self):
+        """Cache counters, for debugging and monitoring."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached': self._snapshot is not None,
+            'age': None if self._loaded_at is None else self._clock() - self._loaded_at,
+        }
@@ -0,0 +1,354 @@
+"""Storage backends for stations and rating events.
+
+The rest of the app talks to worksheet-like tables (gspread's
+``get_all_records``/``append_row``/``append_rows``/``batch_update``), so a
+backend only has to hand those out:
+
+* ``SheetsStorage`` - the ``ev_chargers`` Google spreadsheet.
+* ``SQLiteStorage`` - a local SQLite file with an R*Tree index on station
+  coordinates and B-tree indexes for range queries, for low-latency reads
+  and running the app offline.
+* ``MemoryStorage`` - plain lists, for tests and benchmarks.
+
+``open_storage`` picks one from a URL (``sheets`` or ``sqlite:///path.db``)
+and ``sync`` copies everything from one to the other. From the command line:
+
+    python storage.py sync sheets sqlite:///stations.db
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+
+from ratings import RATING_EVENT_COLUMNS
+from station_store import STATION_COLUMNS
+
+SPREADSHEET_NAME = 'ev_chargers'
+GOOGLE_SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+_A1_RANGE = re.compile(r'^([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?$')
+
+
+def authorize(service_account_info):
+    """gspread client for a ``gcp_service_account`` mapping (e.g. from ``st.secrets``)."""
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    info = dict(service_account_info)
+    info['private_key'] = info['private_key'].replace('\\n', '\n')
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(info, GOOGLE_SCOPE)
+    return gspread.authorize(creds)
+
+
+def _extend_header(worksheet, columns):
+    """Add the trailing ``columns`` an older worksheet's header row doesn't have yet."""
+    header = worksheet.row_values(1)
+    if header and len(header) < len(columns) and header == columns[:len(header)]:
+        worksheet.update(range_name='A1', values=[columns])
+    return worksheet
+
+
+class SheetsStorage:
+    """Tables backed by worksheets of the ``ev_chargers`` spreadsheet."""
+
+    def __init__(self, client, spreadsheet=SPREADSHEET_NAME):
+        self.spreadsheet = client.open(spreadsheet)
+        self._checked = set()
+
+    def _current(self, worksheet, columns):
+        if worksheet.title not in self._checked:
+            _extend_header(worksheet, columns)
+            self._checked.add(worksheet.title)
+        return worksheet
+
+    def stations(self):
+        return self._current(self.spreadsheet.sheet1, STATION_COLUMNS)
+
+    def ratings(self):
+        import gspread
+
+        try:
+            return self._current(self.spreadsheet.worksheet('ratings'), RATING_EVENT_COLUMNS)
+        except gspread.exceptions.WorksheetNotFound:
+            worksheet = self.spreadsheet.add_worksheet('ratings', rows=1000, cols=len(RATING_EVENT_COLUMNS))
+            worksheet.append_row(RATING_EVENT_COLUMNS)
+            return worksheet
+
+    def replace_records(self, worksheet, columns, records):
+        """Overwrite a worksheet with ``records`` (header row included).
+
+        Written in place and then trimmed, rather than cleared first, so a
+        failed write never leaves the sheet empty.
+        """
+        values = [columns] + [[record.get(c, '') for c in columns] for record in records]
+        worksheet.update(range_name='A1', values=values)
+        worksheet.resize(rows=len(values))
+
+
+class SQLiteTable:
+    """Worksheet-like view of one SQLite table.
+
+    Row ids follow sheet numbering (the first data row is row 2), so A1
+    ranges produced by ``write_queue`` address the same rows in both backends.
+    """
+
+    def __init__(self, conn, lock, name, columns, spatial=False, indexed=()):
+        self._conn = conn
+        self._lock = lock
+        self.name = name
+        self.columns = list(columns)
+        self.spatial = spatial
+        column_defs = ', '.join(f'"{c}"' for c in self.columns)
+        with self._lock, self._conn:
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (row INTEGER PRIMARY KEY, {column_defs})')
+            existing = {info[1] for info in self._conn.execute(f'PRAGMA table_info("{name}")')}
+            for column in self.columns:
+                if column not in existing:  # file written before the column existed
+                    self._conn.execute(f'ALTER TABLE "{name}" ADD COLUMN "{column}"')
+            for column in indexed:
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}_{column}" ON "{name}" ("{column}")')
+            if spatial:
+                self._conn.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS "{name}_rtree" '
+                    'USING rtree(row, min_lat, max_lat, min_lon, max_lon)'
+                )
+
+    def _select(self, where='', params=()):
+        column_list = ', '.join(f'"{c}"' for c in self.columns)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {column_list} FROM "{self.name}" AS t {where} ORDER BY t.row', params
+            ).fetchall()
+        return [{c: ('' if v is None else v) for c, v in zip(self.columns, row)} for row in rows]
+
+    def get_all_records(self):
+        return self._select()
+
+    def _index_point(self, row_id):
+        if not self.spatial:
+            return
+        lat, lon = self._conn.execute(
+            f'SELECT lat, lon FROM "{self.name}" WHERE row = ?', (row_id,)
+        ).fetchone()
+        self._conn.execute(f'DELETE FROM "{self.name}_rtree" WHERE row = ?', (row_id,))
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return
+        self._conn.execute(f'INSERT INTO "{self.name}_rtree" VALUES (?, ?, ?, ?, ?)', (row_id, lat, lat, lon, lon))
+
+    def append_row(self, values):
+        self.append_rows([values])
+
+    def append_rows(self, rows):
+        with self._lock, self._conn:
+            self._insert(rows)
+
+    def _insert(self, rows):
+        placeholders = ', '.join('?' for _ in self.columns)
+        column_list = ', '.join(f'"{c}"' for c in self.columns)
+        next_row = self._conn.execute(f'SELECT COALESCE(MAX(row), 1) + 1 FROM "{self.name}"').fetchone()[0]
+        for offset, values in enumerate(rows):
+            values = list(values)[:len(self.columns)]
+            values += [''] * (len(self.columns) - len(values))
+            self._conn.execute(
+                f'INSERT INTO "{self.name}" (row, {column_list}) VALUES (?, {placeholders})',
+                [next_row + offset] + values,
+            )
+            self._index_point(next_row + offset)
+
+    def batch_update(self, data):
+        """Apply ``[{'range': 'H5:I5', 'values': [[...]]}, ...]`` cell updates."""
+        with self._lock, self._conn:
+            for update in data:
+                match = _A1_RANGE.match(update['range'])
+                if match is None:
+                    raise ValueError(f"Unsupported range {update['range']!r}")
+                first_col = self._column_index(match.group(1))
+                first_row = int(match.group(2))
+                for r, values in enumerate(update['values']):
+                    names = self.columns[first_col:first_col + len(values)]
+                    assignments = ', '.join(f'"{n}" = ?' for n in names)
+                    self._conn.execute(
+                        f'UPDATE "{self.name}" SET {assignments} WHERE row = ?',
+                        list(values[:len(names)]) + [first_row + r],
+                    )
+                    if 'lat' in names or 'lon' in names:
+                        self._index_point(first_row + r)
+
+    @staticmethod
+    def _column_index(letters):
+        index = 0
+        for letter in letters:
+            index = index * 26 + ord(letter) - ord('A') + 1
+        return index - 1
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._delete_all()
+
+    def _delete_all(self):
+        self._conn.execute(f'DELETE FROM "{self.name}"')
+        if self.spatial:
+            self._conn.execute(f'DELETE FROM "{self.name}_rtree"')
+
+    def replace_rows(self, rows):
+        """Swap the table's contents for ``rows`` in one transaction."""
+        with self._lock, self._conn:
+            self._delete_all()
+            self._insert(rows)
+
+    def query_bbox(self, south, west, north, east):
+        """Records inside a lat/lon box, answered from the R*Tree."""
+        return self._select(
+            f'JOIN "{self.name}_rtree" AS r ON r.row = t.row '
+            'WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?',
+            (south, north, west, east),
+        )
+
+    def query_range(self, column, low=None, high=None):
+        """Records with ``low <= column <= high`` (either bound optional)."""
+        if column not in self.columns:
+            raise KeyError(column)
+        clauses, params = [], []
+        if low is not None:
+            clauses.append(f't."{column}" >= ?')
+            params.append(low)
+        if high is not None:
+            clauses.append(f't."{column}" <= ?')
+            params.append(high)
+        where = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return self._select(where, params)
+
+
+class SQLiteStorage:
+    """Stations and rating events in a local SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._stations = SQLiteTable(self._conn, self._lock, 'stations', STATION_COLUMNS,
+                                     spatial=True, indexed=('price', 'type', 'status'))
+        self._ratings = SQLiteTable(self._conn, self._lock, 'ratings', RATING_EVENT_COLUMNS)
+
+    def stations(self):
+        return self._stations
+
+    def ratings(self):
+        return self._ratings
+
+    def replace_records(self, table, columns, records):
+        table.replace_rows([[record.get(c, '') for c in columns] for record in records])
+
+
+class MemoryTable:
+    """In-memory worksheet (the subset the app uses); ``calls`` counts API-like calls."""
+
+    def __init__(self, columns, records=()):
+        self.columns = list(columns)
+        self.rows = [[record.get(c, '') for c in self.columns] for record in records]
+        self.calls = 0
+
+    def get_all_records(self):
+        self.calls += 1
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def append_row(self, values):
+        self.append_rows([values])
+
+    def append_rows(self, rows):
+        self.calls += 1
+        self.rows.extend(list(values) for values in rows)
+
+    def batch_update(self, data):
+        self.calls += 1
+        for update in data:
+            match = _A1_RANGE.match(update['range'])
+            if match is None:
+                raise ValueError(f"Unsupported range {update['range']!r}")
+            first_col = SQLiteTable._column_index(match.group(1))
+            first_row = int(match.group(2)) - 2  # header is row 1
+            for r, values in enumerate(update['values']):
+                self.rows[first_row + r][first_col:first_col + len(values)] = values
+
+    def replace_rows(self, rows):
+        self.calls += 1
+        self.rows = [list(values) for values in rows]
+
+
+class MemoryStorage:
+    """Stations and rating events in two ``MemoryTable`` objects."""
+
+    def __init__(self, stations=(), ratings=()):
+        self._stations = MemoryTable(STATION_COLUMNS, stations)
+        self._ratings = MemoryTable(RATING_EVENT_COLUMNS, ratings)
+
+    def stations(self):
+        return self._stations
+
+    def ratings(self):
+        return self._ratings
+
+    def replace_records(self, table, columns, records):
+        table.replace_rows([[record.get(c, '') for c in columns] for record in records])
+
+
+def open_storage(url, service_account_info=None):
+    """Storage for ``'sheets'`` or ``'sqlite:///path/to/file.db'``."""
+    if url == 'sheets':
+        if service_account_info is None:
+            raise ValueError("Google Sheets storage needs gcp_service_account credentials")
+        return SheetsStorage(authorize(service_account_info))
+    if url.startswith('sqlite:///'):
+        return SQLiteStorage(url[len('sqlite:///'):])
+    raise ValueError(f"Unknown storage URL {url!r}")
+
+
+def sync(source, target):
+    """Copy all stations and rating events from ``source`` to ``target``, replacing its contents."""
+    counts = {}
+    for table, columns in (('stations', STATION_COLUMNS), ('ratings', RATING_EVENT_COLUMNS)):
+        records = getattr(source, table)().get_all_records()
+        target.replace_records(getattr(target, table)(), columns, records)
+        counts[table] = len(records)
+    return counts
+
+
+def load_service_account(secrets_path):
+    import tomllib
+
+    with open(secrets_path, 'rb') as f:
+        return tomllib.load(f)['gcp_service_account']
+
+
+def add_storage_arguments(parser, storage=True):
+    """``--storage`` (unless ``storage`` is false) and ``--secrets`` options for a command-line tool."""
+    if storage:
+        parser.add_argument('--storage', default='sheets', help="'sheets' (default) or sqlite:///path.db")
+    parser.add_argument('--secrets', default=os.path.join('.streamlit', 'secrets.toml'),
+                        help="Streamlit secrets file holding gcp_service_account")
+
+
+def storage_from_args(args, url=None):
+    """``open_storage`` for parsed arguments, reading credentials only for Google Sheets."""
+    url = args.storage if url is None else url
+    return open_storage(url, load_service_account(args.secrets) if url == 'sheets' else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy station data between storage backends.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    sync_parser = subparsers.add_parser('sync', help="replace TARGET's data with SOURCE's")
+    sync_parser.add_argument('source', help="'sheets' or sqlite:///path.db")
+    sync_parser.add_argument('target', help="'sheets' or sqlite:///path.db")
+    add_storage_arguments(parser, storage=False)
+    args = parser.parse_args(argv)
+
+    counts = sync(storage_from_args(args, args.source), storage_from_args(args, args.target))
+    print(f"Copied {counts['stations']} stations and {counts['ratings']} rating events.")
+
+
+if __name__ == '__main__':
+    main()
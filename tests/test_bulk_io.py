@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+import bulk_io
+
+URDU_NAMES = ['کراچی چارجنگ اسٹیشن', 'صدر پارکنگ', 'کلفٹن ای وی']
+
+
+def feature_collection(count):
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature',
+             'properties': {'name': f"{URDU_NAMES[i % len(URDU_NAMES)]} {i}", 'type': 'CCS'},
+             'geometry': {'type': 'Point', 'coordinates': [67.0 + i / 1000, 24.86]}}
+            for i in range(count)
+        ],
+    }
+
+
+@pytest.mark.parametrize('read_size', [1, 3, 7, 64])
+def test_geojson_reader_survives_any_chunk_boundary(monkeypatch, read_size):
+    monkeypatch.setattr(bulk_io, '_READ_SIZE', read_size)
+    data = json.dumps(feature_collection(12), ensure_ascii=False).encode('utf-8')
+    chunks = list(bulk_io.iter_geojson_chunks(io.BytesIO(data), chunk_size=5))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+    records = [record for chunk in chunks for record in chunk]
+    assert records[4]['name'] == f"{URDU_NAMES[1]} 4"
+    assert records[11]['lon'] == pytest.approx(67.011)
+    assert records[11]['lat'] == pytest.approx(24.86)
+
+
+def test_geojson_reader_accepts_text_files(monkeypatch):
+    monkeypatch.setattr(bulk_io, '_READ_SIZE', 5)
+    text = json.dumps(feature_collection(3), ensure_ascii=False)
+    records = [record for chunk in bulk_io.iter_geojson_chunks(io.StringIO(text)) for record in chunk]
+    assert [record['name'] for record in records] == [f"{URDU_NAMES[i]} {i}" for i in range(3)]
+
+
+def test_geojson_without_features_is_rejected():
+    with pytest.raises(ValueError):
+        list(bulk_io.iter_geojson_chunks(io.BytesIO(b'{"type": "Feature", "geometry": null}')))
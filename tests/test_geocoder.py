@@ -0,0 +1,110 @@
+import threading
+import time
+
+from geocoder import GeocodeResult, GeocodingService, TokenBucket
+
+
+class FakeClock:
+    """``clock``/``sleep`` pair where sleeping just moves time forward."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeBackend:
+    def __init__(self, places=None, gate=None):
+        self.places = places or {'karachi': (24.86, 67.00)}
+        self.gate = gate
+        self.calls = []
+
+    def geocode(self, query):
+        self.calls.append(query)
+        if self.gate is not None:
+            self.gate.wait(5)
+        coordinates = self.places.get(query.strip().lower())
+        return GeocodeResult(*coordinates, query) if coordinates else None
+
+
+def service(backend, clock=None):
+    clock = clock or FakeClock()
+    return GeocodingService(backend, cache_path=None, rate_limiter=TokenBucket(clock=clock, sleep=clock.sleep))
+
+
+def test_repeated_queries_hit_the_cache():
+    backend = FakeBackend()
+    geocoder = service(backend)
+    first = geocoder.geocode('Karachi')
+    second = geocoder.geocode('  KARACHI ')
+    assert (first.latitude, first.longitude) == (24.86, 67.00)
+    assert second == first
+    assert backend.calls == ['Karachi']
+    assert geocoder.stats() == {'hits': 1, 'misses': 1, 'backend_calls': 1}
+
+
+def test_not_found_is_cached_too():
+    backend = FakeBackend()
+    geocoder = service(backend)
+    assert geocoder.geocode('Atlantis') is None
+    assert geocoder.geocode('atlantis') is None
+    assert len(backend.calls) == 1
+
+
+def test_disk_cache_survives_a_new_service(tmp_path):
+    path = str(tmp_path / 'geocode.sqlite3')
+    clock = FakeClock()
+    GeocodingService(FakeBackend(), cache_path=path,
+                     rate_limiter=TokenBucket(clock=clock, sleep=clock.sleep)).geocode('Karachi')
+    backend = FakeBackend()
+    result = GeocodingService(backend, cache_path=path,
+                              rate_limiter=TokenBucket(clock=clock, sleep=clock.sleep)).geocode('karachi')
+    assert (result.latitude, result.longitude) == (24.86, 67.00)
+    assert backend.calls == []
+
+
+def test_identical_queries_in_flight_are_coalesced():
+    gate = threading.Event()
+    backend = FakeBackend(gate=gate)
+    geocoder = service(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(geocoder.geocode('Karachi'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while not backend.calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)  # let the other threads reach the wait
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(backend.calls) == 1
+    assert len(results) == 5 and len(set(results)) == 1
+
+
+def test_token_bucket_spaces_out_calls():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=1, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == [1.0, 1.0]
+    clock.now += 5  # idle time refills only up to capacity
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [1.0, 1.0, 1.0]
+
+
+def test_backend_calls_are_rate_limited_but_cache_hits_are_not():
+    clock = FakeClock()
+    backend = FakeBackend({'a': (1, 1), 'b': (2, 2), 'c': (3, 3)})
+    geocoder = service(backend, clock)
+    for query in ['a', 'b', 'a', 'c', 'b']:
+        geocoder.geocode(query)
+    assert len(backend.calls) == 3
+    assert sum(clock.sleeps) == 2.0
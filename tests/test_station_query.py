@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from station_frame import normalize_stations
+from station_query import StationQueryEngine, parse_operating_hours
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('9 AM - 10 PM', (540, 1320)),
+    ('10 PM - 6 AM', (1320, 360)),
+    ('24/7', (0, 1440)),
+    ('Open 24 hours', (0, 1440)),
+    ('9-5', (540, 1020)),
+    ('08:30 to 17:30', (510, 1050)),
+    ('22-6', (1320, 360)),
+    ('', None),
+    ('by appointment', None),
+])
+def test_parse_operating_hours(text, expected):
+    assert parse_operating_hours(text) == expected
+
+
+@pytest.fixture
+def engine():
+    raw = pd.DataFrame([
+        {'name': 'Day', 'price': 40, 'type': '7kWh', 'status': 'Available',
+         'amenities': '["WiFi", "Food"]', 'operating_hours': '9-5'},
+        {'name': 'Night', 'price': 60, 'type': '22kWh', 'status': 'Available',
+         'amenities': '["WiFi"]', 'operating_hours': '10 PM - 6 AM'},
+        {'name': 'Always', 'price': 80, 'type': '7kWh', 'status': 'Out of Service',
+         'amenities': '["24/7"]', 'operating_hours': ''},
+        {'name': 'Unpriced', 'price': '', 'type': '7kWh', 'status': 'Available',
+         'amenities': '[]', 'operating_hours': 'ask'},
+    ])
+    return StationQueryEngine(normalize_stations(raw))
+
+
+def names(mask):
+    return [name for name, hit in zip(['Day', 'Night', 'Always', 'Unpriced'], mask) if hit]
+
+
+def test_match_without_criteria_keeps_everything(engine):
+    assert names(engine.match()) == ['Day', 'Night', 'Always', 'Unpriced']
+
+
+def test_match_combines_criteria(engine):
+    assert names(engine.match(types=['7kWh'], statuses=['Available'])) == ['Day', 'Unpriced']
+    assert names(engine.match(types=['7kWh', '22kWh'], amenities=['WiFi'])) == ['Day', 'Night']
+    assert names(engine.match(amenities=['WiFi', 'Food'])) == ['Day']
+    assert names(engine.match(types=['50kWh'])) == []
+
+
+def test_match_price_range_skips_unpriced(engine):
+    assert names(engine.match(min_price=50)) == ['Night', 'Always']
+    assert names(engine.match(min_price=40, max_price=60)) == ['Day', 'Night']
+
+
+def test_match_open_now(engine):
+    assert names(engine.match(open_now=True, now=datetime(2026, 1, 1, 16, 59))) == ['Day', 'Always']
+    assert names(engine.match(open_now=True, now=datetime(2026, 1, 1, 17, 0))) == ['Always']
+    assert names(engine.match(open_now=True, now=datetime(2026, 1, 1, 2, 0))) == ['Night', 'Always']
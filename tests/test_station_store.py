@@ -0,0 +1,131 @@
+import pytest
+
+from spatial_index import nearest_stations
+from station_store import STATION_COLUMNS, StationStore
+from storage import MemoryTable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def station(name, lat, lon, **extra):
+    record = {'name': name, 'lat': lat, 'lon': lon, 'price': 50, 'type': '7kWh', 'status': 'Available',
+              'rating': 0, 'reviews': 0, 'amenities': '[]', 'station_id': name.lower()}
+    record.update(extra)
+    return record
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def sheet():
+    return MemoryTable(STATION_COLUMNS, [station('Alpha', 24.86, 67.00), station('Beta', 24.87, 67.01)])
+
+
+def test_load_is_served_from_cache_within_ttl(sheet, clock):
+    store = StationStore(sheet, ttl=60, clock=clock)
+    first = store.load()
+    clock.now = 59
+    second = store.load()
+    assert sheet.calls == 1
+    assert (store.hits, store.misses) == (1, 1)
+    assert list(second.df['name']) == list(first.df['name']) == ['Alpha', 'Beta']
+
+
+def test_load_refetches_after_ttl(sheet, clock):
+    store = StationStore(sheet, ttl=60, clock=clock)
+    store.load()
+    sheet.append_row([station('Gamma', 24.88, 67.02).get(c, '') for c in STATION_COLUMNS])
+    clock.now = 60
+    assert len(store.load().df) == 3
+    assert sheet.calls == 3  # load, append, reload
+    assert (store.hits, store.misses) == (0, 2)
+
+
+def test_invalidate_and_force_refetch(sheet, clock):
+    store = StationStore(sheet, ttl=60, clock=clock)
+    store.load()
+    store.invalidate()
+    assert not store.stats()['cached']
+    store.load()
+    store.load(force=True)
+    assert store.misses == 3
+    assert store.hits == 0
+
+
+def test_snapshot_parts_match_each_other(sheet, clock):
+    snapshot = StationStore(sheet, clock=clock).load()
+    assert len(snapshot.index) == len(snapshot.df) == snapshot.query.size
+    nearby, total = nearest_stations(snapshot.df, snapshot.index, 24.86, 67.00, 5, limit=10)
+    assert total == 2
+    assert nearby.iloc[0]['name'] == 'Alpha'
+
+
+def test_local_add_leaves_earlier_snapshots_intact(sheet, clock):
+    store = StationStore(sheet, clock=clock)
+    before = store.load()
+    store.add_local_row([station('Gamma', 24.861, 67.001).get(c, '') for c in STATION_COLUMNS])
+    after = store.load()
+    assert len(before.df) == len(before.index) == 2
+    assert len(after.df) == len(after.index) == 3
+    assert after.version != before.version
+    # Positions from the old index must still be valid rows of the old frame.
+    nearby, total = nearest_stations(before.df, before.index, 24.86, 67.00, 5, limit=10)
+    assert total == 2
+    assert set(nearby['name']) == {'Alpha', 'Beta'}
+
+
+def test_local_update_copies_the_frame(sheet, clock):
+    store = StationStore(sheet, clock=clock)
+    before = store.load()
+    store.update_local_row(0, {'status': 'Out of Service'})
+    assert store.load().df.at[0, 'status'] == 'Out of Service'
+    assert before.df.at[0, 'status'] == 'Available'
+
+
+def test_sheet_row_only_for_loaded_rows(sheet, clock):
+    store = StationStore(sheet, clock=clock)
+    store.load()
+    store.add_local_row([station('Gamma', 24.861, 67.001).get(c, '') for c in STATION_COLUMNS])
+    assert store.sheet_row(0) == 2
+    assert store.sheet_row(2) is None
+
+
+
+def test_rating_on_unsaved_station_reaches_the_sheet(sheet, clock):
+    store = StationStore(sheet, clock=clock)
+    store.load()
+    values = [station('Gamma', 24.861, 67.001).get(c, '') for c in STATION_COLUMNS]
+    store.add_local_row(values)
+    row = store.load().df.iloc[2]
+    assert store.record_rating(2, row, 4) == (1, 4.0)
+    assert store.take_rating_updates() == []
+    sheet.append_row(values)  # the queued add is flushed
+    store.invalidate()
+    snapshot = store.load()
+    assert snapshot.ratings.get('gamma') == (1, 4.0)
+    assert snapshot.df.at[2, 'reviews'] == 1
+    assert store.take_rating_updates() == [(4, {'rating': 4.0, 'reviews': 1})]
+    assert store.take_rating_updates() == []
+
+
+def test_reload_before_cell_update_keeps_the_aggregate(sheet, clock):
+    store = StationStore(sheet, clock=clock)
+    snapshot = store.load()
+    store.record_rating(0, snapshot.df.iloc[0], 5)
+    store.record_rating(0, snapshot.df.iloc[0], 3)
+    store.invalidate()  # the queued rating/reviews update has not been written
+    assert store.load().ratings.get('alpha') == (2, 4.0)
+    assert store.take_rating_updates() == [(2, {'rating': 4.0, 'reviews': 2})]
+    sheet.batch_update([{'range': 'H2:I2', 'values': [[4.0, 2]]}])
+    store.invalidate()
+    assert store.load().ratings.get('alpha') == (2, 4.0)
+    assert store.take_rating_updates() == []
@@ -0,0 +1,86 @@
+import sqlite3
+
+import pytest
+
+from ratings import RATING_EVENT_COLUMNS
+from station_store import STATION_COLUMNS
+from storage import MemoryStorage, MemoryTable, SQLiteStorage, sync
+
+
+def station(name, lat, lon, price=50):
+    return {'name': name, 'lat': lat, 'lon': lon, 'price': price, 'type': '7kWh', 'status': 'Available',
+            'station_id': name.lower()}
+
+
+def row(record):
+    return [record.get(c, '') for c in STATION_COLUMNS]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / 'stations.db'))
+
+
+def names(records):
+    return sorted(record['name'] for record in records)
+
+
+def test_appended_rows_are_found_by_bounding_box(storage):
+    table = storage.stations()
+    table.append_rows([row(station('Saddar', 24.86, 67.03)), row(station('Clifton', 24.81, 67.03))])
+    table.append_row(row(station('Lahore', 31.52, 74.35)))
+    assert names(table.get_all_records()) == ['Clifton', 'Lahore', 'Saddar']
+    assert names(table.query_bbox(24.80, 67.00, 24.90, 67.10)) == ['Clifton', 'Saddar']
+    assert names(table.query_bbox(24.85, 67.00, 24.90, 67.10)) == ['Saddar']
+
+
+def test_query_range_uses_either_bound(storage):
+    table = storage.stations()
+    table.append_rows([row(station('Cheap', 24.86, 67.0, price=20)), row(station('Dear', 24.87, 67.0, price=80))])
+    assert names(table.query_range('price', high=50)) == ['Cheap']
+    assert names(table.query_range('price', low=50)) == ['Dear']
+    with pytest.raises(KeyError):
+        table.query_range('colour')
+
+
+def test_batch_update_moves_a_station_in_the_rtree(storage):
+    table = storage.stations()
+    table.append_rows([row(station('Saddar', 24.86, 67.03)), row(station('Clifton', 24.81, 67.03))])
+    # Sheet numbering: row 2 is the first station; B:C are lat/lon.
+    table.batch_update([{'range': 'B3:C3', 'values': [[31.52, 74.35]]}, {'range': 'G2', 'values': [['In Use']]}])
+    records = table.get_all_records()
+    assert records[0]['status'] == 'In Use'
+    assert (records[1]['lat'], records[1]['lon']) == (31.52, 74.35)
+    assert names(table.query_bbox(24.80, 67.00, 24.90, 67.10)) == ['Saddar']
+    assert names(table.query_bbox(31.0, 74.0, 32.0, 75.0)) == ['Clifton']
+    with pytest.raises(ValueError):
+        table.batch_update([{'range': 'Sheet1!B2', 'values': [[1]]}])
+
+
+def test_older_files_get_new_columns(tmp_path):
+    path = str(tmp_path / 'old.db')
+    old_columns = [c for c in STATION_COLUMNS if c != 'station_id']
+    conn = sqlite3.connect(path)
+    conn.execute(f'CREATE TABLE stations (row INTEGER PRIMARY KEY, {", ".join(old_columns)})')
+    conn.execute('INSERT INTO stations (row, name, lat, lon) VALUES (2, ?, 24.86, 67.0)', ('Legacy',))
+    conn.commit()
+    conn.close()
+    table = SQLiteStorage(path).stations()
+    table.append_row(row(station('Fresh', 24.87, 67.0)))
+    records = table.get_all_records()
+    assert [(r['name'], r['station_id']) for r in records] == [('Legacy', ''), ('Fresh', 'fresh')]
+
+
+def test_sync_replaces_the_target_contents(storage):
+    storage.stations().append_rows([row(station('Saddar', 24.86, 67.03)), row(station('Clifton', 24.81, 67.03))])
+    storage.ratings().append_row(['2026-01-01T00:00:00+00:00', 2, 'Saddar', 24.86, 67.03, 5, 'saddar'])
+    target = MemoryStorage([station('Stale', 0, 0)])
+    assert sync(storage, target) == {'stations': 2, 'ratings': 1}
+    assert names(target.stations().get_all_records()) == ['Clifton', 'Saddar']
+    assert target.ratings().get_all_records()[0]['station_id'] == 'saddar'
+
+
+def test_memory_table_rejects_unsupported_ranges():
+    table = MemoryTable(RATING_EVENT_COLUMNS, [{'rating': 1}])
+    with pytest.raises(ValueError):
+        table.batch_update([{'range': 'not-a-range', 'values': [[1]]}])
@@ -0,0 +1,99 @@
+from station_store import STATION_COLUMNS
+from storage import MemoryTable
+from write_queue import MAX_ERRORS, WriteQueue
+
+
+class APIError(Exception):
+    """Shaped like gspread's: the HTTP response hangs off the exception."""
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type('Response', (), {'status_code': status})()
+
+
+class FlakySheet(MemoryTable):
+    """Memory sheet whose next calls fail with the given HTTP statuses."""
+
+    def __init__(self, failures=()):
+        super().__init__(STATION_COLUMNS, [{'name': f"S{i}"} for i in range(5)])
+        self.failures = list(failures)
+        self.append_calls = []
+        self.update_calls = []
+
+    def _maybe_fail(self):
+        if self.failures:
+            raise APIError(self.failures.pop(0))
+
+    def append_rows(self, rows):
+        self._maybe_fail()
+        self.append_calls.append(len(rows))
+        super().append_rows(rows)
+
+    def batch_update(self, data):
+        self._maybe_fail()
+        self.update_calls.append([update['range'] for update in data])
+        super().batch_update(data)
+
+
+def queue(sheet, **options):
+    sleeps = []
+    return WriteQueue(sheet, start=False, sleep=sleeps.append, **options), sleeps
+
+
+def test_rows_are_written_in_batches():
+    sheet = FlakySheet()
+    writes, _ = queue(sheet, batch_size=100)
+    for i in range(250):
+        writes.enqueue_row([f"New {i}"])
+    assert writes.flush() == 250
+    assert sheet.append_calls == [100, 100, 50]
+    assert writes.stats()['rows_written'] == 250
+    assert writes.pending() == 0
+
+
+def test_updates_to_a_row_are_coalesced():
+    sheet = FlakySheet()
+    writes, _ = queue(sheet)
+    writes.enqueue_update(3, {'rating': 3, 'reviews': 1})
+    writes.enqueue_update(3, {'rating': 4, 'reviews': 2})
+    writes.enqueue_update(4, {'price': 40, 'status': 'In Use'})  # columns D and G: two ranges
+    writes.flush()
+    assert sheet.update_calls == [['H3:I3', 'D4:D4', 'G4:G4']]
+    assert sheet.rows[1][7:9] == [4, 2]
+    assert sheet.rows[2][3] == 40 and sheet.rows[2][6] == 'In Use'
+
+
+def test_quota_errors_back_off_exponentially():
+    sheet = FlakySheet(failures=[429, 429])
+    writes, sleeps = queue(sheet, base_delay=1.0)
+    writes.enqueue_row(['New'])
+    writes.flush()
+    assert sheet.append_calls == [1]
+    assert writes.retries == 2
+    assert 1.0 <= sleeps[0] <= 1.5 and 2.0 <= sleeps[1] <= 3.0
+    assert writes.failed == 0
+
+
+def test_writes_still_failing_after_retries_are_queued_again():
+    sheet = FlakySheet(failures=[503] * 3)
+    writes, _ = queue(sheet, max_retries=2)
+    writes.enqueue_row(['New'])
+    writes.enqueue_update(2, {'status': 'In Use'})
+    writes.flush()
+    assert writes.pending() == 1  # the row; the update went through
+    assert writes.requeued == 1
+    writes.flush()
+    assert sheet.append_calls == [1]
+    assert writes.pending() == 0 and writes.failed == 0
+
+
+def test_rejected_writes_are_dropped_and_counted():
+    sheet = FlakySheet(failures=[400] * (MAX_ERRORS + 5))
+    writes, sleeps = queue(sheet, batch_size=1)
+    for i in range(MAX_ERRORS + 5):
+        writes.enqueue_row([f"Bad {i}"])
+    writes.flush()
+    assert sleeps == []
+    assert writes.failed == MAX_ERRORS + 5
+    assert len(writes.errors) == MAX_ERRORS
+    assert writes.last_error == "HTTP 400"
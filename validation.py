@@ -0,0 +1,20 @@
+"""Checks shared by the add-charger form and the bulk importer."""
+from functools import lru_cache
+
+from service_area import SERVICE_AREAS_PATH, ServiceAreaIndex
+
+
+@lru_cache(maxsize=None)
+def service_areas(path=SERVICE_AREAS_PATH):
+    """Service-area index for ``path``, built once per process."""
+    return ServiceAreaIndex.from_file(path)
+
+
+# Sanity check for land: the point must fall inside one of the service-area polygons
+def is_on_land(lat, lon):
+    return service_areas().contains(lat, lon)
+
+
+def has_required_fields(name, lat, lon, charger_type):
+    """Name, non-zero coordinates and a charger type (the description when 'Other' was picked)."""
+    return bool(str(name or '').strip()) and lat != 0 and lon != 0 and bool(str(charger_type or '').strip())
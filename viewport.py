@@ -0,0 +1,131 @@
+"""Viewport-driven station layer for the main map.
+
+``st_folium`` reports the map's bounds and zoom back to the script. Only the
+stations inside that viewport (plus a margin, so small pans don't leave the
+edges empty) are sent to the browser. Below ``CLUSTER_BELOW_ZOOM``, or when
+more than ``MAX_VIEW_MARKERS`` stations are in view at any zoom, they are
+replaced by server-side aggregated count bubbles.
+"""
+import math
+
+import folium
+import numpy as np
+import pandas as pd
+
+from map_layers import StationCluster
+
+CLUSTER_BELOW_ZOOM = 12
+MAX_VIEW_MARKERS = 2000  # above this many stations in view, send count bubbles instead
+VIEW_MARGIN = 0.25  # fraction of the viewport span added on every side
+CLUSTER_CELL_PX = 80  # on-screen size of one aggregation cell
+TILE_SIZE_PX = 256
+
+
+def degrees_per_pixel(zoom):
+    return 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+
+
+def parse_bounds(bounds):
+    """``(south, west, north, east)`` from an ``st_folium`` bounds dict, or ``None``."""
+    try:
+        south = float(bounds['_southWest']['lat'])
+        west = float(bounds['_southWest']['lng'])
+        north = float(bounds['_northEast']['lat'])
+        east = float(bounds['_northEast']['lng'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if south >= north or west >= east:
+        return None
+    return south, west, north, east
+
+
+def approx_bounds(center, zoom, width_px=1200, height_px=600):
+    """Viewport estimate for the first render, before the browser reports real bounds."""
+    step = degrees_per_pixel(zoom)
+    half_lon = width_px * step / 2
+    half_lat = height_px * step * math.cos(math.radians(center[0])) / 2
+    return center[0] - half_lat, center[1] - half_lon, center[0] + half_lat, center[1] + half_lon
+
+
+def expand_bounds(bbox, zoom, margin=VIEW_MARGIN):
+    """Grow ``bbox`` by ``margin`` and snap it outward to the zoom's cell grid.
+
+    Snapping keeps the box (and so the cached layer payload) identical for
+    small pans inside the margin.
+    """
+    south, west, north, east = bbox
+    dlat = (north - south) * margin
+    dlon = (east - west) * margin
+    cell = CLUSTER_CELL_PX * degrees_per_pixel(zoom)
+    return (math.floor((south - dlat) / cell) * cell, math.floor((west - dlon) / cell) * cell,
+            math.ceil((north + dlat) / cell) * cell, math.ceil((east + dlon) / cell) * cell)
+
+
+def stations_in_view(df, index, bbox):
+    """Rows of ``df`` inside ``bbox``, looked up through the spatial index."""
+    positions = index.in_bbox(*bbox)
+    return df.iloc[np.asarray(positions, dtype=np.int64)]
+
+
+def aggregate_clusters(df, zoom):
+    """Station counts per on-screen cell: one row per cell with mean lat/lon and count."""
+    if df.empty:
+        return pd.DataFrame(columns=['lat', 'lon', 'count'])
+    cell = CLUSTER_CELL_PX * degrees_per_pixel(zoom)
+    lats = pd.to_numeric(df['lat'], errors='coerce')
+    lons = pd.to_numeric(df['lon'], errors='coerce')
+    cells = pd.DataFrame({
+        'lat': lats, 'lon': lons,
+        'i': np.floor(lats / cell), 'j': np.floor(lons / cell),
+    }).dropna()
+    return cells.groupby(['i', 'j']).agg(
+        lat=('lat', 'mean'), lon=('lon', 'mean'), count=('lat', 'size')
+    ).reset_index(drop=True)
+
+
+def _count_icon(count):
+    size = 30 if count < 100 else 38 if count < 1000 else 46
+    return folium.DivIcon(
+        icon_size=(size, size),
+        icon_anchor=(size // 2, size // 2),
+        html=(f"<div style='width:{size}px;height:{size}px;line-height:{size}px;border-radius:50%;"
+              f"background:#00c6ffcc;color:#fff;font-weight:bold;text-align:center;"
+              f"box-shadow:0 0 10px #00c6ff99;'>{count}</div>"),
+    )
+
+
+def add_layer_assets(m):
+    """Load the marker-cluster JS/CSS with the base map.
+
+    The viewport layer is swapped in dynamically and may start out as plain
+    count bubbles, so the cluster plugin can't rely on being discovered in it.
+    """
+    for name, url in StationCluster.default_js:
+        m.add_js_link(name, url)
+    for name, url in StationCluster.default_css:
+        m.add_css_link(name, url)
+    return m
+
+
+def viewport_layer(df, index, bbox, zoom, version):
+    """Feature group holding what the map should show for ``bbox`` at ``zoom``.
+
+    ``version`` identifies the contents of ``df`` (the store snapshot's ``version``).
+    """
+    layer = folium.FeatureGroup(name="Stations")
+    if df.empty:
+        return layer
+    zoom = int(zoom)
+    view_bbox = expand_bounds(bbox, zoom)
+    visible = stations_in_view(df, index, view_bbox)
+    if zoom < CLUSTER_BELOW_ZOOM or len(visible) > MAX_VIEW_MARKERS:
+        for cluster in aggregate_clusters(visible, zoom).itertuples(index=False):
+            folium.Marker(
+                [cluster.lat, cluster.lon],
+                icon=_count_icon(int(cluster.count)),
+                tooltip=f"{int(cluster.count)} stations - zoom in for details",
+            ).add_to(layer)
+    else:
+        layer_version = f"{version}:{zoom}:" + ','.join(f"{v:.5f}" for v in view_bbox)
+        StationCluster.from_frame(visible, version=layer_version).add_to(layer)
+    return layer
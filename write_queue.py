@@ -0,0 +1,217 @@
+"""Background write pipeline for the station worksheet.
+
+Form handlers enqueue writes and return immediately; a worker thread drains
+the queue in batches (one ``append_rows`` for new stations, one
+``batch_update`` for cell updates) and retries with exponential backoff when
+the Sheets API answers with a quota or server error. Writes that still fail
+after the last retry go back on the queue for the next flush; writes the API
+rejects outright are logged and counted in ``failed``.
+"""
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+import perf
+from station_store import STATION_COLUMNS
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_ERRORS = 50  # recent exceptions kept for the debug panel
+
+logger = logging.getLogger(__name__)
+
+
+def column_letter(name):
+    """A1 column letter of a station column (``'rating'`` -> ``'H'``)."""
+    return chr(ord('A') + STATION_COLUMNS.index(name))
+
+
+def is_retryable(error):
+    """True for quota/server errors worth retrying (gspread ``APIError`` carries the response)."""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status in RETRYABLE_STATUS
+
+
+class WriteQueue:
+    """Batches station inserts and cell updates onto a worksheet from a background thread.
+
+    ``sheet`` needs gspread's ``append_rows(rows)`` and ``batch_update(data)``,
+    so an in-memory fake works in tests. Pass ``start=False`` and call
+    ``flush()`` to drive it synchronously.
+    """
+
+    def __init__(self, sheet, batch_size=100, flush_interval=2.0, max_retries=5,
+                 base_delay=1.0, max_delay=32.0, sleep=time.sleep, start=True):
+        self.sheet = sheet
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._inserts = []
+        self._updates = OrderedDict()  # A1 range -> row values; later writes to a range win
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+        self.rows_written = 0
+        self.cells_updated = 0
+        self.batches = 0
+        self.retries = 0
+        self.requeued = 0
+        self.failed = 0  # queued writes dropped after a non-retryable error
+        self.errors = deque(maxlen=MAX_ERRORS)
+        if start:
+            self.start()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='sheet-write-queue', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout=10.0):
+        """Stop the worker after writing whatever is still queued."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        if self.pending():
+            logger.error("Stopping with %d sheet writes still unsaved", self.pending())
+
+    def enqueue_row(self, values):
+        """Queue one row for ``append_rows`` (station rows use ``STATION_COLUMNS`` order)."""
+        with self._cond:
+            self._inserts.append(list(values))
+            if len(self._inserts) >= self.batch_size:
+                self._cond.notify_all()
+
+    def enqueue_update(self, row_number, values):
+        """Queue an update of sheet row ``row_number`` (1-based, header is row 1).
+
+        ``values`` maps column names to new cell values.
+        """
+        names = [name for name in STATION_COLUMNS if name in values]
+        if not names:
+            return
+        positions = [STATION_COLUMNS.index(name) for name in names]
+        with self._cond:
+            # Split into contiguous column runs so each run is one A1 range.
+            run = [names[0]]
+            for prev, pos, name in zip(positions, positions[1:], names[1:]):
+                if pos != prev + 1:
+                    self._add_update(row_number, run, values)
+                    run = []
+                run.append(name)
+            self._add_update(row_number, run, values)
+
+    def _add_update(self, row_number, names, values):
+        a1 = f"{column_letter(names[0])}{row_number}:{column_letter(names[-1])}{row_number}"
+        self._updates.pop(a1, None)
+        self._updates[a1] = [values[name] for name in names]
+
+    def pending(self):
+        with self._cond:
+            return len(self._inserts) + len(self._updates)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._inserts) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far; returns the number of queued writes handled.
+
+        Stops early when the sheet is still unavailable after the last retry;
+        the unwritten batch is queued again for the next flush.
+        """
+        handled = 0
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    rows = self._inserts[:self.batch_size]
+                    del self._inserts[:self.batch_size]
+                    updates = list(self._updates.items())
+                    self._updates.clear()
+                if not rows and not updates:
+                    return handled
+                retry_rows, retry_updates = [], []
+                if rows:
+                    error = self._call(self.sheet.append_rows, rows)
+                    if error is None:
+                        self.rows_written += len(rows)
+                    elif is_retryable(error):
+                        retry_rows = rows
+                    else:
+                        self._drop(len(rows), "station rows", error)
+                if updates:
+                    error = self._call(self.sheet.batch_update,
+                                       [{'range': a1, 'values': [cells]} for a1, cells in updates])
+                    if error is None:
+                        self.cells_updated += sum(len(cells) for _, cells in updates)
+                    elif is_retryable(error):
+                        retry_updates = updates
+                    else:
+                        self._drop(len(updates), "cell updates", error)
+                if retry_rows or retry_updates:
+                    self._requeue(retry_rows, retry_updates)
+                    return handled
+                handled += len(rows) + len(updates)
+
+    def _requeue(self, rows, updates):
+        """Put a batch back at the front of the queue; newer writes to the same range win."""
+        with self._cond:
+            self._inserts[:0] = rows
+            for a1, cells in reversed(updates):
+                if a1 not in self._updates:
+                    self._updates[a1] = cells
+                    self._updates.move_to_end(a1, last=False)
+        self.requeued += len(rows) + len(updates)
+        logger.warning("Sheet unavailable after %d retries; %d writes queued again",
+                       self.max_retries, len(rows) + len(updates))
+
+    def _drop(self, count, what, error):
+        self.failed += count
+        logger.error("Dropped %d %s after sheet error: %s", count, what, error)
+
+    def _call(self, method, *args, **kwargs):
+        """Call ``method`` with retries; returns ``None`` on success, else the last exception."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                perf.count('sheet_calls')
+                method(*args, **kwargs)
+                self.batches += 1
+                return None
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.errors.append(e)
+                    return e
+                self.retries += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                self._sleep(delay + random.uniform(0, delay / 2))
+
+    @property
+    def last_error(self):
+        return str(self.errors[-1]) if self.errors else ''
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'rows_written': self.rows_written,
+            'cells_updated': self.cells_updated,
+            'batches': self.batches,
+            'retries': self.retries,
+            'requeued': self.requeued,
+            'failed': self.failed,
+            'errors': len(self.errors),
+        }